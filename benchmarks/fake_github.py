@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Any, Optional
+from aiohttp import web
+
+def _sha(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class FakeGitHub:
+    """Локальная замена GitHub REST API для эндпоинтов, которые использует GitHubService.
+
+    Данные синтетические и детерминированные: у каждого токена `repos`
+    репозиториев, в каждом дерево глубины `depth` с `dirs` папками и
+    `files` файлами на уровень. Поддерживаются ETag/304, пагинация через
+    Link и заголовки X-RateLimit-*.
+    """
+
+    def __init__(self, repos: int = 150, depth: int = 3, dirs: int = 4, files: int = 8,
+                 latency: float = 0.05, jitter: float = 0.0, rate_limit: int = 5000):
+        self.repo_count = repos
+        self.depth = depth
+        self.dirs = dirs
+        self.files = files
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.reset_at = int(time.time()) + 3600
+        self.remaining: Dict[str, int] = {}
+        self.calls: Counter = Counter()
+        self._trees: Dict[str, List[Dict[str, Any]]] = {}
+        self._deleted: Dict[str, set] = {}
+        # созданные через Git Data API деревья и коммиты: sha -> удаляемые пути
+        self._new_trees: Dict[str, set] = {}
+        self._new_commits: Dict[str, set] = {}
+        # события репозиториев для /watch: full_name -> [event], старые первыми
+        self.events: Dict[str, List[Dict[str, Any]]] = {}
+        self._next_event_id = 1
+
+        self.app = web.Application()
+        self.app.router.add_get('/user', self._user)
+        self.app.router.add_get('/user/repos', self._user_repos)
+        self.app.router.add_get('/repos/{owner}/{repo}', self._repo)
+        self.app.router.add_get('/repos/{owner}/{repo}/events', self._events)
+        self.app.router.add_get('/repos/{owner}/{repo}/git/ref/heads/{branch}', self._ref)
+        self.app.router.add_get('/repos/{owner}/{repo}/git/trees/{sha}', self._tree)
+        self.app.router.add_get('/repos/{owner}/{repo}/git/commits/{sha}', self._commit)
+        self.app.router.add_post('/repos/{owner}/{repo}/git/trees', self._create_tree)
+        self.app.router.add_post('/repos/{owner}/{repo}/git/commits', self._create_commit)
+        self.app.router.add_patch('/repos/{owner}/{repo}/git/refs/heads/{branch}', self._update_ref)
+        self.app.router.add_get('/repos/{owner}/{repo}/contents/{path:.*}', self._contents)
+        self.app.router.add_put('/repos/{owner}/{repo}/contents/{path:.*}', self._put_contents)
+        self.app.router.add_delete('/repos/{owner}/{repo}/contents/{path:.*}', self._delete_contents)
+        self.app.router.add_get('/repos/{owner}/{repo}/contents', self._contents)
+
+    # --- данные -------------------------------------------------------------
+
+    def _tree_entries(self, full_name: str) -> List[Dict[str, Any]]:
+        entries = self._trees.get(full_name)
+        if entries is None:
+            entries = []
+
+            def walk(prefix: str, level: int) -> None:
+                for i in range(self.files):
+                    path = f'{prefix}file_{i}.py'
+                    entries.append({'path': path, 'type': 'blob', 'mode': '100644',
+                                    'sha': _sha(full_name + path), 'size': 100 + i * 37})
+                if level < self.depth:
+                    for i in range(self.dirs):
+                        path = f'{prefix}dir_{i}'
+                        entries.append({'path': path, 'type': 'tree', 'mode': '040000',
+                                        'sha': _sha(full_name + path)})
+                        walk(path + '/', level + 1)
+
+            walk('', 1)
+            self._trees[full_name] = entries
+        deleted = self._deleted.get(full_name, set())
+        return [entry for entry in entries if entry['path'] not in deleted]
+
+    def _head_sha(self, full_name: str) -> str:
+        return _sha(full_name + str(len(self._deleted.get(full_name, ()))))
+
+    # --- инфраструктура -----------------------------------------------------
+
+    async def _respond(self, request: web.Request, endpoint: str, body: Any,
+                       status: int = 200, headers: Optional[Dict[str, str]] = None) -> web.Response:
+        self.calls[endpoint] += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        token = request.headers.get('Authorization', '')
+        remaining = self.remaining.get(token, self.rate_limit)
+        rate_headers = {
+            'X-RateLimit-Limit': str(self.rate_limit),
+            'X-RateLimit-Reset': str(self.reset_at)
+        }
+        if remaining <= 0:
+            rate_headers['X-RateLimit-Remaining'] = '0'
+            return web.json_response({'message': 'API rate limit exceeded'}, status=403, headers=rate_headers)
+
+        payload = json.dumps(body)
+        etag = '"' + _sha(payload) + '"'
+        if status == 200 and request.method == 'GET' and request.headers.get('If-None-Match') == etag:
+            # 304 не расходует лимит
+            rate_headers['X-RateLimit-Remaining'] = str(remaining)
+            self.calls['304'] += 1
+            return web.Response(status=304, headers={**rate_headers, 'ETag': etag})
+
+        self.remaining[token] = remaining - 1
+        rate_headers['X-RateLimit-Remaining'] = str(remaining - 1)
+        all_headers = {**rate_headers, **(headers or {})}
+        if request.method == 'GET':
+            all_headers['ETag'] = etag
+        return web.Response(text=payload, status=status, content_type='application/json', headers=all_headers)
+
+    def add_event(self, full_name: str, event_type: str, payload: Dict[str, Any]) -> None:
+        """Добавить событие в ленту репозитория (GET /repos/{repo}/events)"""
+        self.events.setdefault(full_name, []).append({
+            'id': str(self._next_event_id),
+            'type': event_type,
+            'actor': {'login': 'bench-user'},
+            'repo': {'name': full_name},
+            'payload': payload
+        })
+        self._next_event_id += 1
+
+    # --- эндпоинты ----------------------------------------------------------
+
+    async def _user(self, request: web.Request) -> web.Response:
+        return await self._respond(request, 'user', {'login': 'bench-user', 'id': 1})
+
+    async def _user_repos(self, request: web.Request) -> web.Response:
+        per_page = int(request.query.get('per_page', 30))
+        page = int(request.query.get('page', 1))
+        last = max(1, (self.repo_count + per_page - 1) // per_page)
+        start = (page - 1) * per_page
+        repos = [
+            {'name': f'repo-{i}', 'full_name': f'bench/repo-{i}', 'private': i % 3 == 0}
+            for i in range(start, min(start + per_page, self.repo_count))
+        ]
+        headers = {}
+        if last > 1:
+            base = f'{request.url.with_query(None)}?per_page={per_page}&sort=updated'
+            links = [f'<{base}&page={last}>; rel="last"']
+            if page < last:
+                links.insert(0, f'<{base}&page={page + 1}>; rel="next"')
+            headers['Link'] = ', '.join(links)
+        return await self._respond(request, 'user/repos', repos, headers=headers)
+
+    async def _repo(self, request: web.Request) -> web.Response:
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        return await self._respond(request, 'repos', {'full_name': full_name, 'default_branch': 'main'})
+
+    async def _events(self, request: web.Request) -> web.Response:
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        per_page = int(request.query.get('per_page', 30))
+        events = list(reversed(self.events.get(full_name, [])))[:per_page]
+        return await self._respond(request, 'events', events)
+
+    async def _ref(self, request: web.Request) -> web.Response:
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        body = {'ref': 'refs/heads/main', 'object': {'sha': self._head_sha(full_name), 'type': 'commit'}}
+        return await self._respond(request, 'git/ref', body)
+
+    async def _tree(self, request: web.Request) -> web.Response:
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        body = {'sha': request.match_info['sha'], 'tree': self._tree_entries(full_name), 'truncated': False}
+        return await self._respond(request, 'git/trees', body)
+
+    async def _commit(self, request: web.Request) -> web.Response:
+        sha = request.match_info['sha']
+        return await self._respond(request, 'git/commits', {'sha': sha, 'tree': {'sha': _sha('tree' + sha)}})
+
+    async def _create_tree(self, request: web.Request) -> web.Response:
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        body = await request.json()
+        existing = {entry['path'] for entry in self._tree_entries(full_name)}
+        deleted = {entry['path'] for entry in body['tree'] if entry.get('sha', '') is None}
+        if not deleted <= existing:
+            return await self._respond(request, 'git/trees:post', {'message': 'GitRPC::BadObjectState'}, status=422)
+        sha = _sha(json.dumps(body, sort_keys=True))
+        self._new_trees[sha] = deleted
+        return await self._respond(request, 'git/trees:post', {'sha': sha}, status=201)
+
+    async def _create_commit(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        sha = _sha(json.dumps(body, sort_keys=True))
+        self._new_commits[sha] = self._new_trees.get(body['tree'], set())
+        return await self._respond(request, 'git/commits:post', {'sha': sha}, status=201)
+
+    async def _update_ref(self, request: web.Request) -> web.Response:
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        body = await request.json()
+        self._deleted.setdefault(full_name, set()).update(self._new_commits.pop(body['sha'], set()))
+        return await self._respond(request, 'git/refs:patch', {'object': {'sha': self._head_sha(full_name)}})
+
+    async def _contents(self, request: web.Request) -> web.Response:
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        path = request.match_info.get('path', '').strip('/')
+        entries = self._tree_entries(full_name)
+        for entry in entries:
+            if entry['path'] == path and entry['type'] == 'blob':
+                if request.headers.get('Accept') == 'application/vnd.github.raw':
+                    self.calls['contents:raw'] += 1
+                    return web.Response(body=b'x' * entry['size'], content_type='application/octet-stream')
+                body = {'name': path.rsplit('/', 1)[-1], 'path': path, 'type': 'file',
+                        'sha': entry['sha'], 'size': entry['size'], 'encoding': 'base64',
+                        'content': 'cHJpbnQoImhpIikK'}
+                return await self._respond(request, 'contents', body)
+        prefix = f'{path}/' if path else ''
+        listing = [
+            {'name': entry['path'][len(prefix):], 'path': entry['path'],
+             'type': 'dir' if entry['type'] == 'tree' else 'file',
+             'sha': entry['sha'], 'size': entry.get('size', 0)}
+            for entry in entries
+            if entry['path'].startswith(prefix) and '/' not in entry['path'][len(prefix):]
+        ]
+        if path and not listing:
+            return await self._respond(request, 'contents', {'message': 'Not Found'}, status=404)
+        return await self._respond(request, 'contents', listing)
+
+    async def _put_contents(self, request: web.Request) -> web.Response:
+        return await self._respond(request, 'contents:put', {'content': {}}, status=201)
+
+    async def _delete_contents(self, request: web.Request) -> web.Response:
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        self._deleted.setdefault(full_name, set()).add(request.match_info['path'])
+        return await self._respond(request, 'contents:delete', {'commit': {}})
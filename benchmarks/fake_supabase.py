@@ -0,0 +1,219 @@
+import asyncio
+import json
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Any, Tuple
+from aiohttp import web
+
+# первичные ключи таблиц для upsert (on_conflict без явного списка колонок)
+PRIMARY_KEYS = {
+    'users': ('user_id',),
+    'bot_conversations': ('name', 'key'),
+    'bot_user_data': ('user_id',),
+    'bot_chat_data': ('chat_id',)
+}
+
+
+class FakeSupabase:
+    """Локальная замена PostgREST (/rest/v1) в объёме, нужном SupabaseService.
+
+    Таблицы хранятся в памяти списками словарей. Поддерживаются select с
+    фильтрами eq./in./like., count=exact, insert, upsert (merge/ignore duplicates),
+    update, delete и RPC get_user_stats, get_bot_stats, rotate_user_tokens,
+    acquire_lease, release_lease.
+    """
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls: Counter = Counter()
+        self._next_id = 1
+
+        self.app = web.Application()
+        self.app.router.add_post('/rest/v1/rpc/{name}', self._rpc)
+        self.app.router.add_get('/rest/v1/{table}', self._select)
+        self.app.router.add_post('/rest/v1/{table}', self._insert)
+        self.app.router.add_patch('/rest/v1/{table}', self._update)
+        self.app.router.add_delete('/rest/v1/{table}', self._delete)
+
+    # --- разбор запроса -----------------------------------------------------
+
+    @staticmethod
+    def _filters(request: web.Request) -> List[Tuple[str, str, Any]]:
+        filters = []
+        for column, value in request.query.items():
+            if column in ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns'):
+                continue
+            op, _, arg = value.partition('.')
+            if op == 'not':
+                inner, _, arg = arg.partition('.')
+                op = 'not.' + inner
+            if op == 'in':
+                arg = [item.strip('"') for item in arg.strip('()').split(',') if item]
+            filters.append((column, op, arg))
+        return filters
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], filters: List[Tuple[str, str, Any]]) -> bool:
+        for column, op, arg in filters:
+            value = '' if row.get(column) is None else str(row.get(column))
+            if op == 'eq' and value != arg:
+                return False
+            if op == 'in' and value not in arg:
+                return False
+            if op == 'like' and not re.fullmatch(
+                    '.*'.join(re.escape(part) for part in re.split(r'[%*]', arg)), value):
+                return False
+            if op == 'is' and arg == 'null' and row.get(column) is not None:
+                return False
+            if op == 'not.is' and arg == 'null' and row.get(column) is None:
+                return False
+            if op in ('gt', 'lt') and row.get(column) is None:
+                return False
+            if op == 'gt' and not float(row[column]) > float(arg):
+                return False
+            if op == 'lt' and not float(row[column]) < float(arg):
+                return False
+        return True
+
+    @staticmethod
+    def _project(row: Dict[str, Any], select: str) -> Dict[str, Any]:
+        if not select or select == '*':
+            return dict(row)
+        columns = [column.strip() for column in select.split(',')]
+        return {column: row.get(column) for column in columns}
+
+    async def _respond(self, table: str, op: str, body: Any, status: int = 200,
+                       headers: Dict[str, str] = None) -> web.Response:
+        self.calls[f'{table}:{op}'] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return web.Response(text=json.dumps(body, default=str), status=status,
+                            content_type='application/json', headers=headers)
+
+    # --- эндпоинты ----------------------------------------------------------
+
+    async def _select(self, request: web.Request) -> web.Response:
+        table = request.match_info['table']
+        rows = [row for row in self.tables.get(table, []) if self._matches(row, self._filters(request))]
+        if 'order' in request.query:
+            # сортировка по последней колонке первой - стабильный sort даёт нужный порядок
+            for order in reversed(request.query['order'].split(',')):
+                column, _, direction = order.partition('.')
+                rows.sort(key=lambda row: row.get(column), reverse=direction == 'desc')
+        offset = int(request.query.get('offset', 0))
+        if 'limit' in request.query:
+            rows = rows[offset:offset + int(request.query['limit'])]
+        else:
+            rows = rows[offset:]
+        select = request.query.get('select', '*')
+        headers = {}
+        if 'count=exact' in request.headers.get('Prefer', ''):
+            last = max(len(rows) - 1, 0)
+            headers['Content-Range'] = f'0-{last}/{len(rows)}'
+        return await self._respond(table, 'select', [self._project(row, select) for row in rows], headers=headers)
+
+    async def _insert(self, request: web.Request) -> web.Response:
+        table = request.match_info['table']
+        payload = await request.json()
+        rows = payload if isinstance(payload, list) else [payload]
+        prefer = request.headers.get('Prefer', '')
+        stored = self.tables.setdefault(table, [])
+
+        if 'resolution=' in prefer:
+            conflict = request.query.get('on_conflict')
+            keys = tuple(conflict.split(',')) if conflict else PRIMARY_KEYS.get(table, ('id',))
+            result = []
+            for row in rows:
+                existing = next(
+                    (item for item in stored if all(str(item.get(k)) == str(row.get(k)) for k in keys)), None
+                )
+                if existing is None:
+                    stored.append(dict(row))
+                    result.append(row)
+                elif 'merge-duplicates' in prefer:
+                    existing.update(row)
+                    result.append(existing)
+            return await self._respond(table, 'upsert', result, status=201)
+
+        for row in rows:
+            row = dict(row)
+            row.setdefault('id', self._next_id)
+            self._next_id += 1
+            stored.append(row)
+        return await self._respond(table, 'insert', rows, status=201)
+
+    async def _update(self, request: web.Request) -> web.Response:
+        table = request.match_info['table']
+        fields = await request.json()
+        filters = self._filters(request)
+        updated = []
+        for row in self.tables.get(table, []):
+            if self._matches(row, filters):
+                row.update(fields)
+                updated.append(row)
+        return await self._respond(table, 'update', updated)
+
+    async def _delete(self, request: web.Request) -> web.Response:
+        table = request.match_info['table']
+        filters = self._filters(request)
+        rows = self.tables.get(table, [])
+        deleted = [row for row in rows if self._matches(row, filters)]
+        self.tables[table] = [row for row in rows if not self._matches(row, filters)]
+        return await self._respond(table, 'delete', deleted)
+
+    async def _rpc(self, request: web.Request) -> web.Response:
+        name = request.match_info['name']
+        params = await request.json()
+        if name == 'get_user_stats':
+            user_id = str(params.get('p_user_id'))
+            actions = [row for row in self.tables.get('action_history', []) if str(row.get('user_id')) == user_id]
+            by_type: Counter = Counter(row.get('action_type') for row in actions)
+            body = {
+                'total_actions': len(actions),
+                'actions_by_type': dict(by_type),
+                'recent_actions': actions[-5:]
+            }
+            return await self._respond('rpc', name, body)
+        if name == 'get_bot_stats':
+            users = self.tables.get('users', [])
+            actions = self.tables.get('action_history', [])
+            active = {row.get('user_id') for row in actions}
+            body = {
+                'total_users': len(users),
+                'users_with_tokens': sum(1 for row in users if row.get('github_token_encrypted')),
+                'estimated': False,
+                # в фейке нет времени действий - вся история считается свежей
+                'daily_active_users': len(active),
+                'weekly_active_users': len(active),
+                'actions_per_day': len(actions)
+            }
+            return await self._respond('rpc', name, body)
+        if name == 'rotate_user_tokens':
+            users = {str(row.get('user_id')): row for row in self.tables.get('users', [])}
+            updated = 0
+            for item in params.get('rows', []):
+                row = users.get(str(item['user_id']))
+                if row is not None and row.get('github_token_encrypted') == item['old_token']:
+                    row['github_token_encrypted'] = item['new_token']
+                    updated += 1
+            return await self._respond('rpc', name, updated)
+        if name == 'acquire_lease':
+            leases = self.tables.setdefault('bot_leases', [])
+            lease = next((row for row in leases if row['name'] == params['p_name']), None)
+            now = time.time()
+            if lease is None:
+                lease = {'name': params['p_name']}
+                leases.append(lease)
+            elif lease['holder'] != params['p_holder'] and lease['expires_at'] >= now:
+                return await self._respond('rpc', name, False)
+            lease.update(holder=params['p_holder'], expires_at=now + params['p_ttl_seconds'])
+            return await self._respond('rpc', name, True)
+        if name == 'release_lease':
+            self.tables['bot_leases'] = [
+                row for row in self.tables.get('bot_leases', [])
+                if (row['name'], row['holder']) != (params['p_name'], params['p_holder'])
+            ]
+            return await self._respond('rpc', name, None)
+        return await self._respond('rpc', name, {'message': f'function {name} not found'}, status=404)
@@ -0,0 +1,66 @@
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {'id': 1000000, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Транспорт Bot API без сети: отвечает на методы, которые вызывают обработчики,
+    и запоминает последнюю клавиатуру в каждом чате, чтобы драйвер мог «нажимать» кнопки"""
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self.keyboards: Dict[int, List[List[Dict[str, Any]]]] = {}
+        self.texts: Dict[int, str] = {}
+        self._message_id = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    def _message(self, chat_id: int, text: str) -> Dict[str, Any]:
+        self._message_id += 1
+        return {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': text
+        }
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        endpoint = url.rsplit('/', 1)[-1]
+        self.calls[endpoint] += 1
+        params = request_data.parameters if request_data else {}
+
+        if endpoint == 'getMe':
+            result: Any = BOT_USER
+        elif endpoint in ('sendMessage', 'editMessageText', 'sendDocument'):
+            chat_id = int(params.get('chat_id', 0))
+            markup = params.get('reply_markup')
+            if isinstance(markup, str):
+                markup = json.loads(markup)
+            # сообщения без кнопок (ответы, превью файла) не заменяют последнюю клавиатуру
+            if markup:
+                self.keyboards[chat_id] = markup.get('inline_keyboard', [])
+                self.texts[chat_id] = params.get('text', '')
+            result = self._message(chat_id, params.get('text', ''))
+        else:
+            # answerCallbackQuery, deleteMessage и прочее
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    def buttons(self, chat_id: int) -> List[Dict[str, Any]]:
+        """Кнопки последнего сообщения бота в чате"""
+        return [button for row in self.keyboards.get(chat_id, []) for button in row]
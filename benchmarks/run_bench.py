@@ -0,0 +1,318 @@
+"""Нагрузочный прогон бота без сети.
+
+Настоящие StartHandler, ReposHandler и CallbackHandler работают поверх
+локальных заглушек GitHub (fake_github) и PostgREST (fake_supabase), а
+Telegram заменён транспортом fake_telegram. N пользователей одновременно
+проходят сценарий /start → токен → /repos → репозиторий → папка → файл →
+просмотр файла → назад → следующая страница репозиториев.
+
+    python -m benchmarks.run_bench --users 50 --rounds 3 --output bench.json
+    python -m benchmarks.run_bench --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Any, Optional
+from aiohttp import web
+
+from config import config
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.fake_supabase import FakeSupabase
+from benchmarks.fake_telegram import FakeTelegramRequest
+
+BOT_TOKEN = '123456:bench'
+
+
+class FakeServers:
+    """Заглушки в отдельном потоке со своим event loop - их работа не
+    искажает задержки, измеряемые в event loop бота"""
+
+    def __init__(self, github: FakeGitHub, supabase: FakeSupabase):
+        self.github = github
+        self.supabase = supabase
+        self.github_url = ''
+        self.supabase_url = ''
+        self._loop = asyncio.new_event_loop()
+        self._runners: List[web.AppRunner] = []
+        self._thread = threading.Thread(target=self._loop.run_forever, name='fake-servers', daemon=True)
+
+    async def _start_app(self, app: web.Application) -> str:
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        self._runners.append(runner)
+        port = site._server.sockets[0].getsockname()[1]
+        return f'http://127.0.0.1:{port}'
+
+    async def _start(self) -> None:
+        self.github_url = await self._start_app(self.github.app)
+        self.supabase_url = await self._start_app(self.supabase.app)
+
+    async def _stop(self) -> None:
+        for runner in self._runners:
+            await runner.cleanup()
+
+    def start(self) -> None:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def build_application(request: FakeTelegramRequest):
+    """Сервисы и обработчики собираются той же функцией, что и в main.py"""
+    from telegram import Bot
+    from telegram.ext import Application
+    from main import build_services, register_handlers
+
+    services = build_services()
+    bot = Bot(BOT_TOKEN, request=request, get_updates_request=FakeTelegramRequest())
+    app = Application.builder().bot(bot).updater(None).build()
+    register_handlers(app, services)
+    return app, services.supabase, services.users, services.github
+
+
+class Driver:
+    """Синтетические обновления Telegram от имени N пользователей"""
+
+    def __init__(self, app, request: FakeTelegramRequest):
+        self.app = app
+        self.request = request
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors = 0
+        self._update_id = 0
+        self._message_id = 0
+
+    def _next_ids(self):
+        self._update_id += 1
+        self._message_id += 1
+        return self._update_id, self._message_id
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'}
+
+    async def _process(self, label: str, data: Dict[str, Any]) -> None:
+        from telegram import Update
+        update = Update.de_json(data, self.app.bot)
+        started = time.perf_counter()
+        try:
+            await self.app.process_update(update)
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ {label}: {e}")
+        self.latencies[label].append(time.perf_counter() - started)
+
+    async def send_text(self, user_id: int, text: str, label: str) -> None:
+        update_id, message_id = self._next_ids()
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+            'text': text
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        await self._process(label, {'update_id': update_id, 'message': message})
+
+    async def click(self, user_id: int, button: Dict[str, Any], label: str) -> None:
+        update_id, message_id = self._next_ids()
+        await self._process(label, {
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': self._user(user_id),
+                'chat_instance': str(user_id),
+                'data': button['callback_data'],
+                'message': {
+                    'message_id': message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'from': {'id': 1000000, 'is_bot': True, 'first_name': 'Bench'},
+                    'text': self.request.texts.get(user_id, '')
+                }
+            }
+        })
+
+    def _find(self, user_id: int, predicate, index: int = 0) -> Optional[Dict[str, Any]]:
+        buttons = [button for button in self.request.buttons(user_id) if predicate(button)]
+        return buttons[index % len(buttons)] if buttons else None
+
+    async def run_user(self, user_id: int, rounds: int) -> None:
+        """Сценарий одного пользователя; повторные раунды идут по тёплым кэшам"""
+        await self.send_text(user_id, '/start', 'start')
+        await self.send_text(user_id, f'ghp_bench_{user_id}', 'receive_token')
+
+        for round_number in range(rounds):
+            await self.send_text(user_id, '/repos', 'show_repos')
+            steps = (
+                ('repo', lambda b: b['callback_data'].startswith('repo:')),
+                ('item:dir', lambda b: b['callback_data'].startswith('item:') and b['text'].startswith('📁')),
+                ('item:file', lambda b: b['callback_data'].startswith('item:') and b['text'].startswith('📄')),
+                ('download', lambda b: b['callback_data'].startswith('download:')),
+                ('repo', lambda b: b['callback_data'].startswith('repo:')),
+                ('back_repos', lambda b: b['callback_data'] == 'back_repos'),
+                ('repos_page', lambda b: b['callback_data'].startswith('repos_page:'))
+            )
+            for label, predicate in steps:
+                button = self._find(user_id, predicate, user_id + round_number)
+                if button is None:
+                    print(f"❌ {user_id}: нет кнопки для шага {label}")
+                    self.errors += 1
+                    break
+                await self.click(user_id, button, label)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run(args) -> Dict[str, Any]:
+    github = FakeGitHub(repos=args.repos, latency=args.github_latency, jitter=args.github_jitter,
+                        rate_limit=args.rate_limit)
+    supabase = FakeSupabase(latency=args.supabase_latency)
+    servers = FakeServers(github, supabase)
+    servers.start()
+
+    from cryptography.fernet import Fernet
+    config.GITHUB_API_URL = servers.github_url
+    config.SUPABASE_URL = servers.supabase_url
+    config.SUPABASE_KEY = 'bench.bench.bench'
+    config.ENCRYPRION_KEY = Fernet.generate_key().decode()
+    config.GITHUB_CACHE_DB_PATH = ''
+    config.PERSISTENCE_BACKEND = ''
+
+    request = FakeTelegramRequest()
+    app, supabase_service, user_service, github_service = build_application(request)
+    driver = Driver(app, request)
+
+    await app.initialize()
+    user_service.start()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            driver.run_user(100000 + i, args.rounds) for i in range(args.users)
+        ))
+    finally:
+        duration = time.perf_counter() - started
+        cache_stats = github_service.cache.stats()
+        single_flight = github_service.single_flight.stats()
+        await app.shutdown()
+        await github_service.close()
+        await user_service.close()
+        supabase_service.close()
+        servers.stop()
+
+    updates = sum(len(values) for values in driver.latencies.values())
+    github_calls = dict(github.calls)
+    supabase_calls = dict(supabase.calls)
+    return {
+        'params': vars(args),
+        'updates': updates,
+        'errors': driver.errors,
+        'duration': round(duration, 3),
+        'updates_per_sec': round(updates / duration, 1) if duration else 0.0,
+        'handlers': {
+            label: {
+                'count': len(values),
+                'p50_ms': round(_percentile(values, 50) * 1000, 2),
+                'p95_ms': round(_percentile(values, 95) * 1000, 2),
+                'p99_ms': round(_percentile(values, 99) * 1000, 2)
+            }
+            for label, values in sorted(driver.latencies.items())
+        },
+        'upstream': {
+            'github': github_calls,
+            'supabase': supabase_calls,
+            'telegram': dict(request.calls)
+        },
+        'upstream_per_update': {
+            'github': round((sum(github_calls.values()) - github_calls.get('304', 0)) / max(updates, 1), 3),
+            'supabase': round(sum(supabase_calls.values()) / max(updates, 1), 3)
+        },
+        'github_cache': cache_stats,
+        'single_flight': single_flight
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print("=" * 60)
+    print(f"📨 Обновлений: {result['updates']} за {result['duration']} с "
+          f"({result['updates_per_sec']} в секунду), ошибок: {result['errors']}")
+    print(f"{'обработчик':<14}{'n':>6}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for label, stats in result['handlers'].items():
+        print(f"{label:<14}{stats['count']:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    per_update = result['upstream_per_update']
+    print(f"🌐 Запросов на обновление: GitHub {per_update['github']}, Supabase {per_update['supabase']}")
+    print("=" * 60)
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Сравнить с прошлым прогоном; False - есть регрессия больше threshold процентов"""
+    ok = True
+
+    def delta(new: float, old: float) -> float:
+        return (new - old) / old * 100 if old else 0.0
+
+    change = delta(result['updates_per_sec'], baseline['updates_per_sec'])
+    print(f"📊 Обновлений в секунду: {baseline['updates_per_sec']} → {result['updates_per_sec']} ({change:+.1f}%)")
+    if change < -threshold:
+        ok = False
+    for label, stats in result['handlers'].items():
+        old = baseline.get('handlers', {}).get(label)
+        if old is None:
+            continue
+        change = delta(stats['p95_ms'], old['p95_ms'])
+        mark = '❌' if change > threshold else '  '
+        if change > threshold:
+            ok = False
+        print(f"{mark} {label:<14} p95 {old['p95_ms']} → {stats['p95_ms']} мс ({change:+.1f}%)")
+    for name, value in result['upstream_per_update'].items():
+        old = baseline.get('upstream_per_update', {}).get(name)
+        if old is not None:
+            print(f"   {name:<14} запросов на обновление {old} → {value}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='нагрузочный прогон бота на локальных заглушках')
+    parser.add_argument('--users', type=int, default=50, help='одновременных пользователей')
+    parser.add_argument('--rounds', type=int, default=3, help='проходов сценария на пользователя')
+    parser.add_argument('--repos', type=int, default=150, help='репозиториев у каждого пользователя')
+    parser.add_argument('--github-latency', type=float, default=0.05, help='задержка GitHub, с')
+    parser.add_argument('--github-jitter', type=float, default=0.02, help='случайная добавка к задержке GitHub, с')
+    parser.add_argument('--supabase-latency', type=float, default=0.01, help='задержка Supabase, с')
+    parser.add_argument('--rate-limit', type=int, default=5000, help='лимит запросов GitHub на токен')
+    parser.add_argument('--output', help='сохранить результат в JSON')
+    parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help='допустимое ухудшение при сравнении, %%')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 Результат сохранён: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,11 +12,143 @@ class Config:
     GITHUB_API_URL: str = "https://api.github.com"
     MAX_REPOS_DISPLAY: int = 10
 
+    # ishga tushirish rejimi: "polling" yoki "webhook"
+    BOT_MODE: str = os.getenv("BOT_MODE", "polling")
+    WEBHOOK_LISTEN: str = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+    WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", "8443"))
+    WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/telegram")
+    # tashqi manzil (https://.../telegram); bo'sh bo'lsa Telegramda ro'yxatdan o'tkazilmaydi
+    WEBHOOK_URL: str = os.getenv("WEBHOOK_URL", "")
+    # webhook rejimida majburiy (1-256 belgi: A-Z, a-z, 0-9, _ va -): usiz bot ishga tushmaydi
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+    # to'xtashda joriy so'rovlarni kutish vaqti
+    WEBHOOK_DRAIN_TIMEOUT: float = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))
+
+    # Prometheus metrikalari alohida portda beriladi (0 - o'chirilgan)
+    METRICS_PATH: str = os.getenv("METRICS_PATH", "/metrics")
+    METRICS_LISTEN: str = os.getenv("METRICS_LISTEN", "0.0.0.0")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    # webhook serverida ham berish (u internetga ochiq va metrikalar autentifikatsiyasiz) - faqat
+    # aniq yoqilganda va METRICS_PORT berilmagan bo'lsa
+    METRICS_ON_WEBHOOK: bool = os.getenv("METRICS_ON_WEBHOOK", "0") == "1"
+    # event loop kechikishini o'lchash oralig'i
+    LOOP_LAG_INTERVAL: float = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+
+    # GitHub HTTP klienti (umumiy keep-alive pool)
+    GITHUB_TIMEOUT: float = float(os.getenv("GITHUB_TIMEOUT", "10"))
+    GITHUB_CONNECT_TIMEOUT: float = float(os.getenv("GITHUB_CONNECT_TIMEOUT", "5"))
+    GITHUB_MAX_CONNECTIONS: int = int(os.getenv("GITHUB_MAX_CONNECTIONS", "100"))
+    GITHUB_MAX_KEEPALIVE: int = int(os.getenv("GITHUB_MAX_KEEPALIVE", "20"))
+    GITHUB_KEEPALIVE_EXPIRY: float = float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", "30"))
+    GITHUB_HTTP2: bool = os.getenv("GITHUB_HTTP2", "1") == "1"
+    # sahifalarni parallel yuklash chegarasi
+    GITHUB_PAGE_CONCURRENCY: int = int(os.getenv("GITHUB_PAGE_CONCURRENCY", "4"))
+    # bir nechta faylni bitta commit qilishda shoxcha siljib ketsa qayta urinishlar soni
+    GITHUB_COMMIT_RETRIES: int = int(os.getenv("GITHUB_COMMIT_RETRIES", "3"))
+
+    # GitHub limitlari: fon so'rovlari oxirgi RESERVE so'rovni ishlatmaydi,
+    # qoldiq SLOWDOWN dan kam bo'lsa so'rovlar sekinlashtiriladi
+    GITHUB_RATE_RESERVE: int = int(os.getenv("GITHUB_RATE_RESERVE", "500"))
+    GITHUB_RATE_SLOWDOWN: int = int(os.getenv("GITHUB_RATE_SLOWDOWN", "1000"))
+    GITHUB_RATE_MAX_DELAY: float = float(os.getenv("GITHUB_RATE_MAX_DELAY", "2"))
+    # foydalanuvchi so'rovi shundan ko'p kutmaydi - darhol rad etiladi
+    GITHUB_RATE_MAX_WAIT: float = float(os.getenv("GITHUB_RATE_MAX_WAIT", "3"))
+
+    # GitHub javoblari keshi (ETag / If-None-Match)
+    GITHUB_CACHE_SIZE: int = int(os.getenv("GITHUB_CACHE_SIZE", "2000"))
+    # shu vaqt ichida javob so'rovsiz beriladi
+    GITHUB_CACHE_FRESH_TTL: float = float(os.getenv("GITHUB_CACHE_FRESH_TTL", "5"))
+    # keyin yana shuncha vaqt eski javob beriladi va fonda tekshiriladi
+    GITHUB_CACHE_STALE_TTL: float = float(os.getenv("GITHUB_CACHE_STALE_TTL", "60"))
+    # bo'sh bo'lsa kesh faqat xotirada
+    GITHUB_CACHE_DB_PATH: str = os.getenv("GITHUB_CACHE_DB_PATH", "")
+
+    # ochilgan repozitoriylarning to'liq daraxti (commit SHA bo'yicha)
+    REPO_TREE_CACHE_SIZE: int = int(os.getenv("REPO_TREE_CACHE_SIZE", "50"))
+    REPO_TREE_TTL: float = float(os.getenv("REPO_TREE_TTL", "3600"))
+    # papka ro'yxati sahifalari: bir sahifadagi tugmalar soni va saralangan ro'yxatlar keshi
+    DIR_PAGE_SIZE: int = int(os.getenv("DIR_PAGE_SIZE", "20"))
+    DIR_LISTING_CACHE_SIZE: int = int(os.getenv("DIR_LISTING_CACHE_SIZE", "2000"))
+    # /find uchun fayl yo'llari indekslari (commit SHA bo'yicha): 100k fayl ~ 20-30 MB
+    PATH_INDEX_CACHE_SIZE: int = int(os.getenv("PATH_INDEX_CACHE_SIZE", "10"))
+    PATH_INDEX_TTL: float = float(os.getenv("PATH_INDEX_TTL", "3600"))
+    FIND_MAX_RESULTS: int = int(os.getenv("FIND_MAX_RESULTS", "10"))
+
+    # tugmalar uchun qisqa id lar (callback_data 64 baytdan oshmasligi kerak)
+    CALLBACK_REGISTRY_SIZE: int = int(os.getenv("CALLBACK_REGISTRY_SIZE", "50000"))
+    CALLBACK_REGISTRY_TTL: float = float(os.getenv("CALLBACK_REGISTRY_TTL", "86400"))
+
+    # foydalanuvchi sessiyalari (xotirada) va ularni bazaga yozish oralig'i
+    SESSION_CACHE_SIZE: int = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+    SESSION_FLUSH_INTERVAL: float = float(os.getenv("SESSION_FLUSH_INTERVAL", "5"))
+
+    # fayllarni ko'rish/yuklab olish: hajm chegarasi (Telegram bot 50 MB gacha yuboradi),
+    # matn sifatida ko'rsatiladigan fayl chegarasi va oqim bo'lagi
+    FILE_DOWNLOAD_MAX_BYTES: int = int(os.getenv("FILE_DOWNLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+    FILE_PREVIEW_MAX_BYTES: int = int(os.getenv("FILE_PREVIEW_MAX_BYTES", "3000"))
+    FILE_DOWNLOAD_CHUNK_SIZE: int = int(os.getenv("FILE_DOWNLOAD_CHUNK_SIZE", "65536"))
+
+    # ochilgan GitHub tokenlari keshi (xotirada qisqa muddat saqlanadi)
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "5000"))
+    TOKEN_CACHE_TTL: float = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+    # muddati o'tgan tokenlar shuncha sekundda bir xotiradan o'chiriladi (foydalanuvchi qaytmasa ham)
+    TOKEN_CACHE_SWEEP_INTERVAL: float = float(os.getenv("TOKEN_CACHE_SWEEP_INTERVAL", "30"))
+
+    # action_history ga fonda paketlab yozish
+    ACTION_LOG_QUEUE_SIZE: int = int(os.getenv("ACTION_LOG_QUEUE_SIZE", "10000"))
+    ACTION_LOG_BATCH_SIZE: int = int(os.getenv("ACTION_LOG_BATCH_SIZE", "200"))
+    ACTION_LOG_FLUSH_INTERVAL: float = float(os.getenv("ACTION_LOG_FLUSH_INTERVAL", "2"))
+    ACTION_LOG_RETRY_LIMIT: int = int(os.getenv("ACTION_LOG_RETRY_LIMIT", "5000"))
+
+    # ConversationHandler holatini saqlash (qayta ishga tushganda tiklanadi):
+    # "" (faqat xotira), "sqlite" yoki "supabase"
+    PERSISTENCE_BACKEND: str = os.getenv("PERSISTENCE_BACKEND", "")
+    PERSISTENCE_SQLITE_PATH: str = os.getenv("PERSISTENCE_SQLITE_PATH", "bot_state.sqlite")
+    # o'zgarishlar shu oraliqda paket bilan yoziladi
+    PERSISTENCE_FLUSH_INTERVAL: float = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "5"))
+
     #malumotlar bazasi sekretlari
     SUPABASE_URL: str = os.getenv("SUPABASE_URL")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY")
+    # sinxron klient uchun oqimlar soni va parallel so'rovlar chegarasi
+    SUPABASE_MAX_WORKERS: int = int(os.getenv("SUPABASE_MAX_WORKERS", "16"))
+    SUPABASE_MAX_CONCURRENCY: int = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "16"))
 
     #shifr kaliti
     ENCRYPRION_KEY = os.getenv("ENCRYPTION_KEY")
+    # oldingi kalitlar (vergul bilan): eski tokenlarni ochish uchun, kalit almashtirilganda
+    ENCRYPTION_OLD_KEYS: str = os.getenv("ENCRYPTION_OLD_KEYS", "")
+
+    # tokenlarni yangi kalit bilan qayta shifrlash (bot ishlayotganda fonda)
+    TOKEN_ROTATION_ENABLED: bool = os.getenv("TOKEN_ROTATION_ENABLED", "0") == "1"
+    TOKEN_ROTATION_BATCH_SIZE: int = int(os.getenv("TOKEN_ROTATION_BATCH_SIZE", "500"))
+    TOKEN_ROTATION_WORKERS: int = int(os.getenv("TOKEN_ROTATION_WORKERS", "4"))
+    # sekundiga ko'pi bilan shuncha qator (bazani bo'g'ib qo'ymaslik uchun)
+    TOKEN_ROTATION_RATE: float = float(os.getenv("TOKEN_ROTATION_RATE", "1000"))
+    TOKEN_ROTATION_CHECKPOINT: str = os.getenv("TOKEN_ROTATION_CHECKPOINT", "token_rotation.json")
+
+    # /watch: repozitoriy hodisalarini so'rash. Faollik bo'lmasa oraliq MIN dan MAX gacha
+    # ikki baravar oshadi; TICK - qaysi repozitoriyni so'rash vaqti kelganini tekshirish oralig'i
+    WATCH_MIN_INTERVAL: float = float(os.getenv("WATCH_MIN_INTERVAL", "60"))
+    WATCH_MAX_INTERVAL: float = float(os.getenv("WATCH_MAX_INTERVAL", "900"))
+    WATCH_TICK_INTERVAL: float = float(os.getenv("WATCH_TICK_INTERVAL", "15"))
+    # bir vaqtda so'raladigan repozitoriylar / yuboriladigan xabarlar soni
+    WATCH_CONCURRENCY: int = int(os.getenv("WATCH_CONCURRENCY", "8"))
+    WATCH_MAX_PER_USER: int = int(os.getenv("WATCH_MAX_PER_USER", "20"))
+    # har bir obunachining tokeni repozitoriyni ko'ra olishi shuncha sekundda bir qayta tekshiriladi;
+    # xabar faqat ruxsati tasdiqlanganlarga yuboriladi
+    WATCH_ACCESS_TTL: float = float(os.getenv("WATCH_ACCESS_TTL", "3600"))
+    # bir nechta nusxa ishlasa repozitoriylarni faqat ijara (migrations/006) egasi so'raydi;
+    # ijara har tikda uzaytiriladi, LEASE_TTL tikdan ancha katta bo'lishi kerak
+    WATCH_LEASE_TTL: float = float(os.getenv("WATCH_LEASE_TTL", "60"))
+    # boshqa nusxalarda qilingan obunalar shuncha sekundda bir bazadan qayta o'qiladi
+    WATCH_RELOAD_INTERVAL: float = float(os.getenv("WATCH_RELOAD_INTERVAL", "60"))
+
+    # /botstats buyrug'iga ruxsat berilgan Telegram user_id lar (vergul bilan)
+    ADMIN_IDS: str = os.getenv("ADMIN_IDS", "")
+    # bot statistikasi fonda shu oraliqda yangilanadi, so'rovlar xotiradan javob oladi
+    BOT_STATS_INTERVAL: float = float(os.getenv("BOT_STATS_INTERVAL", "300"))
+    # users jadvalida bundan ko'p qator bo'lsa aniq count o'rniga taxminiy son
+    BOT_STATS_EXACT_LIMIT: int = int(os.getenv("BOT_STATS_EXACT_LIMIT", "100000"))
 
-config = Config()
\ No newline at end of file
+config = Config()
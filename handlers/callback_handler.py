@@ -1,22 +1,54 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import html
+import tempfile
+from typing import Optional
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
+from config import config
 from services.user_service import UserService
 from services.github_service import GitHubService
+from services.callback_registry import CallbackRegistry, CallbackEntry
+from services.metrics import timed_handler
+from handlers.keyboards import build_repos_keyboard, repo_callback, page_slice, navigation_row
+from handlers.messages import github_error_text
+
+# префиксы callback_data, которые попадают в метки метрик (остальное - "other")
+CALLBACK_PREFIXES = {'repo', 'item', 'download', 'delete', 'select', 'toggle', 'delete_selected',
+                     'back_repos', 'repos_page', 'dir_page', 'select_page', 'noop'}
+
+
+def _callback_label(update: Update) -> str:
+    prefix = (update.callback_query.data or '').split(':', 1)[0]
+    return 'callback:' + (prefix if prefix in CALLBACK_PREFIXES else 'other')
+
+
+def _decode_text(data: bytes) -> Optional[str]:
+    """Текст файла или None, если файл двоичный"""
+    if b'\0' in data:
+        return None
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
 
 class CallbackHandler:
     """Обработчик нажатий на кнопки"""
     
-    def __init__(self, user_service: UserService, github_service: GitHubService):
+    def __init__(self, user_service: UserService, github_service: GitHubService,
+                 callbacks: CallbackRegistry):
         self.user_service = user_service
         self.github_service = github_service
+        self.callbacks = callbacks
     
+    @timed_handler(_callback_label)
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Основной обработчик callback'ов"""
         query = update.callback_query
         await query.answer()
         
         user_id = update.effective_user.id
-        token = self.user_service.get_token(user_id)
+        token = await self.user_service.get_token(user_id)
         
         if not token:
             await query.edit_message_text("❌ Токен не найден. Используй /start")
@@ -28,73 +60,173 @@ class CallbackHandler:
             await self._handle_repo(query, user_id, token, data)
         elif data.startswith("item:"):
             await self._handle_item(query, user_id, token, data)
+        elif data.startswith("download:"):
+            await self._handle_download(query, user_id, token, data)
         elif data.startswith("delete:"):
             await self._handle_delete(query, user_id, token, data)
+        elif data.startswith("select:"):
+            await self._handle_select(query, user_id, token, data)
+        elif data.startswith("toggle:"):
+            await self._handle_toggle(query, user_id, token, data)
+        elif data.startswith("delete_selected:"):
+            await self._handle_delete_selected(query, user_id, token, data)
         elif data == "back_repos":
             await self._handle_back_to_repos(query, user_id, token)
+        elif data.startswith("repos_page:"):
+            page = int(data.split(":", 1)[1])
+            await self._handle_back_to_repos(query, user_id, token, page)
+        elif data.startswith("dir_page:"):
+            await self._handle_dir_page(query, user_id, token, data)
+        elif data.startswith("select_page:"):
+            await self._handle_select_page(query, user_id, token, data)
     
     async def _handle_repo(self, query, user_id: int, token: str, data: str) -> None:
         """Обработка открытия репозитория"""
-        repo_name = data.split(":", 1)[1]
-        self.user_service.set_current_repo(user_id, repo_name)
-        self.user_service.set_current_path(user_id, '')
+        entry = await self._resolve(query, data)
+        if entry is None:
+            return
+        repo_name = entry.repo
+        await self.user_service.set_current_repo(user_id, repo_name)
         self.user_service.log_action(user_id, 'open_repo', repo_name)
         
-        contents = self.github_service.get_contents(token, repo_name)
+        # Всё дерево грузится один раз на коммит, дальше папки открываются из памяти
+        await self.github_service.load_tree(token, repo_name)
+        contents = await self.github_service.list_directory(token, repo_name)
         
         if contents:
-            keyboard = self._build_contents_keyboard(contents, repo_name, is_root=True)
+            keyboard = self._build_contents_keyboard(contents, repo_name, '')
             reply_markup = InlineKeyboardMarkup(keyboard)
             await query.edit_message_text(
                 f"📦 Репозиторий: {repo_name}",
                 reply_markup=reply_markup
             )
         else:
-            await query.edit_message_text("❌ Не удалось загрузить содержимое репозитория")
+            await query.edit_message_text(github_error_text(
+                self.github_service, token, "❌ Не удалось загрузить содержимое репозитория"
+            ))
+    
+    async def _resolve(self, query, data: str) -> Optional[CallbackEntry]:
+        """Найти запись кнопки по id из callback_data"""
+        entry = self.callbacks.resolve(data.split(":", 1)[1])
+        if entry is None:
+            await query.edit_message_text("⌛ Кнопка устарела. Открой /repos заново")
+        return entry
     
     async def _handle_item(self, query, user_id: int, token: str, data: str) -> None:
         """Обработка открытия папки или файла"""
-        parts = data.split(":", 2)
-        item_type = parts[1]
-        item_path = parts[2]
-        repo_name = self.user_service.get_current_repo(user_id)
+        entry = await self._resolve(query, data)
+        if entry is None:
+            return
+        item_type = entry.type
+        item_path = entry.path
+        repo_name = entry.repo
         
         if item_type == "dir":
-            self.user_service.set_current_path(user_id, item_path)
+            await self.user_service.set_current_path(user_id, item_path)
             self.user_service.log_action(user_id, 'open_folder', repo_name, item_path)
-            contents = self.github_service.get_contents(token, repo_name, item_path)
+            contents = await self.github_service.list_directory(token, repo_name, item_path)
             
             if contents:
-                keyboard = self._build_contents_keyboard(contents, repo_name, is_root=False)
+                keyboard = self._build_contents_keyboard(contents, repo_name, item_path)
                 reply_markup = InlineKeyboardMarkup(keyboard)
                 await query.edit_message_text(f"📁 {item_path}", reply_markup=reply_markup)
+            else:
+                await query.edit_message_text(github_error_text(
+                    self.github_service, token, "❌ Не удалось загрузить папку"
+                ))
         else:
             self.user_service.log_action(user_id, 'view_file', repo_name, item_path)
-            contents = self.github_service.get_contents(token, repo_name, item_path)
+            # размер и sha уже есть в листинге папки - сам файл не скачиваем
+            sha, size = entry.sha, entry.size
+            if sha is None:
+                contents = await self.github_service.get_contents(token, repo_name, item_path)
+                if not contents:
+                    await query.edit_message_text(github_error_text(
+                        self.github_service, token, "❌ Не удалось загрузить файл"
+                    ))
+                    return
+                sha, size = contents['sha'], contents['size']
+            entry_id = self.callbacks.register(CallbackEntry(repo_name, item_path, 'file', sha, size))
             
-            if contents:
-                keyboard = [
-                    [InlineKeyboardButton("🗑 Удалить файл", 
-                                        callback_data=f"delete:{item_path}:{contents['sha']}")],
-                    [InlineKeyboardButton("⬅️ Назад", callback_data=f"repo:{repo_name}")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                size_kb = contents['size'] / 1024
-                await query.edit_message_text(
-                    f"📄 Файл: {item_path}\n"
-                    f"📊 Размер: {size_kb:.2f} KB",
-                    reply_markup=reply_markup
-                )
+            keyboard = []
+            if size <= config.FILE_DOWNLOAD_MAX_BYTES:
+                keyboard.append([InlineKeyboardButton("👁 Открыть / скачать", callback_data=f"download:{entry_id}")])
+            keyboard.append([InlineKeyboardButton("🗑 Удалить файл", callback_data=f"delete:{entry_id}")])
+            keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data=repo_callback(self.callbacks, repo_name))])
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            
+            size_kb = size / 1024
+            await query.edit_message_text(
+                f"📄 Файл: {item_path}\n"
+                f"📊 Размер: {size_kb:.2f} KB\n"
+                f"🔖 SHA: {sha[:7]}",
+                reply_markup=reply_markup
+            )
+    
+    async def _handle_dir_page(self, query, user_id: int, token: str, data: str) -> None:
+        """Перелистывание папки: страница режется из уже отсортированного листинга"""
+        _, folder_id, page = data.split(":", 2)
+        entry = await self._resolve(query, f"dir_page:{folder_id}")
+        if entry is None:
+            return
+        contents = await self.github_service.list_directory(token, entry.repo, entry.path)
+        if contents:
+            keyboard = self._build_contents_keyboard(contents, entry.repo, entry.path, int(page))
+            title = f"📁 {entry.path}" if entry.path else f"📦 Репозиторий: {entry.repo}"
+            await query.edit_message_text(title, reply_markup=InlineKeyboardMarkup(keyboard))
+        else:
+            await query.edit_message_text(github_error_text(
+                self.github_service, token, "❌ Не удалось загрузить папку"
+            ))
+    
+    async def _handle_download(self, query, user_id: int, token: str, data: str) -> None:
+        """Показать небольшой текстовый файл в сообщении, остальные - отправить документом"""
+        entry = await self._resolve(query, data)
+        if entry is None:
+            return
+        if entry.size > config.FILE_DOWNLOAD_MAX_BYTES:
+            await query.message.reply_text(
+                f"❌ Файл больше {config.FILE_DOWNLOAD_MAX_BYTES // (1024 * 1024)} MB"
+            )
+            return
+        
+        # файл идёт из GitHub на диск кусками и целиком в памяти не собирается
+        with tempfile.NamedTemporaryFile(prefix='github-') as file:
+            size = await self.github_service.download_file(
+                token, entry.repo, entry.path, file, config.FILE_DOWNLOAD_MAX_BYTES
+            )
+            if size is None:
+                await query.message.reply_text(github_error_text(
+                    self.github_service, token, "❌ Не удалось скачать файл"
+                ))
+                return
+            self.user_service.log_action(user_id, 'download_file', entry.repo, entry.path)
+            file.seek(0)
+            
+            if size <= config.FILE_PREVIEW_MAX_BYTES:
+                text = _decode_text(file.read())
+                if text is not None:
+                    await query.message.reply_text(
+                        f"📄 {html.escape(entry.path)}\n<pre>{html.escape(text)}</pre>",
+                        parse_mode=ParseMode.HTML
+                    )
+                    return
+                file.seek(0)
+            # read_file_handle=False: httpx отправляет файл с диска, не читая его целиком в память
+            await query.message.reply_document(document=InputFile(
+                file, filename=entry.path.rsplit('/', 1)[-1], read_file_handle=False
+            ))
     
     async def _handle_delete(self, query, user_id: int, token: str, data: str) -> None:
         """Обработка удаления файла"""
-        parts = data.split(":", 2)
-        file_path = parts[1]
-        sha = parts[2]
-        repo_name = self.user_service.get_current_repo(user_id)
+        entry = await self._resolve(query, data)
+        if entry is None:
+            return
+        file_path = entry.path
+        sha = entry.sha
+        repo_name = entry.repo
         
-        success = self.github_service.delete_file(
+        success = await self.github_service.delete_file(
             token, repo_name, file_path, sha, 
             f"Delete {file_path} via Telegram bot"
         )
@@ -103,40 +235,144 @@ class CallbackHandler:
             self.user_service.log_action(user_id, 'delete_file', repo_name, file_path)
             await query.edit_message_text(f"✅ Файл {file_path} успешно удалён!")
         else:
-            await query.edit_message_text(f"❌ Ошибка при удалении файла")
+            await query.edit_message_text(github_error_text(
+                self.github_service, token, "❌ Ошибка при удалении файла"
+            ))
+    
+    async def _show_selection(self, query, token: str, repo_name: str, path: str, selected,
+                              page: int = 0) -> None:
+        """Показать страницу папки в режиме выбора файлов"""
+        contents = await self.github_service.list_directory(token, repo_name, path)
+        if not contents:
+            await query.edit_message_text(github_error_text(
+                self.github_service, token, "❌ Не удалось загрузить папку"
+            ))
+            return
+        keyboard = self._build_selection_keyboard(contents, repo_name, path, selected, page)
+        await query.edit_message_text(
+            f"☑️ {path or repo_name}\nОтметь файлы (выбрано: {len(selected)})",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
     
-    async def _handle_back_to_repos(self, query, user_id: int, token: str) -> None:
-        """Возврат к списку репозиториев"""
-        repos = self.github_service.get_repositories(token)
+    async def _handle_select(self, query, user_id: int, token: str, data: str) -> None:
+        """Включить режим выбора файлов в папке"""
+        entry = await self._resolve(query, data)
+        if entry is None:
+            return
+        await self.user_service.start_selection(user_id)
+        await self._show_selection(query, token, entry.repo, entry.path, set())
+    
+    async def _handle_select_page(self, query, user_id: int, token: str, data: str) -> None:
+        """Перелистывание папки в режиме выбора"""
+        _, folder_id, page = data.split(":", 2)
+        entry = await self._resolve(query, f"select_page:{folder_id}")
+        if entry is None:
+            return
+        selected = await self.user_service.get_selected(user_id) or set()
+        await self._show_selection(query, token, entry.repo, entry.path, selected, int(page))
+    
+    async def _handle_toggle(self, query, user_id: int, token: str, data: str) -> None:
+        """Отметить файл или снять отметку (страница выбора сохраняется)"""
+        _, entry_id, page = data.split(":", 2)
+        entry = await self._resolve(query, f"toggle:{entry_id}")
+        if entry is None:
+            return
+        selected = await self.user_service.toggle_selected(user_id, entry.path)
+        folder = entry.path.rpartition('/')[0]
+        await self._show_selection(query, token, entry.repo, folder, selected, int(page))
+    
+    async def _handle_delete_selected(self, query, user_id: int, token: str, data: str) -> None:
+        """Удалить отмеченные файлы одним коммитом"""
+        entry = await self._resolve(query, data)
+        if entry is None:
+            return
+        selected = await self.user_service.get_selected(user_id)
+        if not selected:
+            await query.edit_message_text("❌ Файлы не выбраны. Открой /repos заново")
+            return
+        
+        paths = sorted(selected)
+        success = await self.github_service.delete_files(
+            token, entry.repo, paths,
+            f"Delete {len(paths)} files via Telegram bot"
+        )
+        
+        if success:
+            await self.user_service.clear_selection(user_id)
+            for path in paths:
+                self.user_service.log_action(user_id, 'delete_file', entry.repo, path)
+            await query.edit_message_text(f"✅ Удалено файлов: {len(paths)} (один коммит)")
+        else:
+            await query.edit_message_text(github_error_text(
+                self.github_service, token, "❌ Ошибка при удалении файлов"
+            ))
+    
+    async def _handle_back_to_repos(self, query, user_id: int, token: str, page: int = 0) -> None:
+        """Возврат к списку репозиториев (страницы берутся из памяти)"""
+        repos = await self.user_service.get_repos(user_id)
+        if repos is None:
+            repos = await self.github_service.get_repositories(token)
+            if repos:
+                await self.user_service.set_repos(user_id, repos)
         
         if repos:
-            keyboard = []
-            for repo in repos[:20]:
-                button_text = f"📁 {repo['name']}"
-                if repo['private']:
-                    button_text += " 🔒"
-                keyboard.append([InlineKeyboardButton(
-                    button_text,
-                    callback_data=f"repo:{repo['full_name']}"
-                )])
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text("📦 Выбери репозиторий:", reply_markup=reply_markup)
+            reply_markup = build_repos_keyboard(repos, self.callbacks, page)
+            await query.edit_message_text(
+                f"📦 Твои репозитории ({len(repos)}):",
+                reply_markup=reply_markup
+            )
     
-    def _build_contents_keyboard(self, contents, repo_name: str, is_root: bool):
-        """Построить клавиатуру с содержимым папки"""
+    def _build_contents_keyboard(self, contents, repo_name: str, path: str, page: int = 0):
+        """Построить клавиатуру со страницей папки (path '' - корень репозитория).
+        contents уже отсортирован, кнопки регистрируются только для видимой страницы"""
         keyboard = []
+        page_items, page, pages = page_slice(contents, page, config.DIR_PAGE_SIZE)
         
-        for item in contents:
+        for item in page_items:
             icon = "📁" if item['type'] == 'dir' else "📄"
+            entry = CallbackEntry(repo_name, item['path'], item['type'], item.get('sha'), item.get('size', 0))
             keyboard.append([InlineKeyboardButton(
                 f"{icon} {item['name']}",
-                callback_data=f"item:{item['type']}:{item['path']}"
+                callback_data=f"item:{self.callbacks.register(entry)}"
             )])
         
-        if is_root:
+        folder = self.callbacks.register(CallbackEntry(repo_name, path, 'dir'))
+        if pages > 1:
+            keyboard.append(navigation_row(f"dir_page:{folder}:", page, pages))
+        
+        if any(item['type'] == 'file' for item in contents):
+            keyboard.append([InlineKeyboardButton("☑️ Выбрать файлы", callback_data=f"select:{folder}")])
+        
+        if not path:
             keyboard.append([InlineKeyboardButton("⬅️ Назад к репозиториям", callback_data="back_repos")])
         else:
-            keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data=f"repo:{repo_name}")])
+            keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data=repo_callback(self.callbacks, repo_name))])
+        
+        return keyboard
+    
+    def _build_selection_keyboard(self, contents, repo_name: str, path: str, selected, page: int = 0):
+        """Клавиатура режима выбора: страница файлов с отметками и удаление одним коммитом.
+        Кнопки регистрируются только для видимой страницы"""
+        keyboard = []
+        files = [item for item in contents if item['type'] == 'file']
+        page_files, page, pages = page_slice(files, page, config.DIR_PAGE_SIZE)
+        
+        for item in page_files:
+            mark = "✅" if item['path'] in selected else "⬜"
+            entry = CallbackEntry(repo_name, item['path'], 'file', item.get('sha'), item.get('size', 0))
+            keyboard.append([InlineKeyboardButton(
+                f"{mark} {item['name']}",
+                callback_data=f"toggle:{self.callbacks.register(entry)}:{page}"
+            )])
+        
+        folder = self.callbacks.register(CallbackEntry(repo_name, path, 'dir'))
+        if pages > 1:
+            keyboard.append(navigation_row(f"select_page:{folder}:", page, pages))
+        if selected:
+            keyboard.append([InlineKeyboardButton(
+                f"🗑 Удалить выбранные ({len(selected)})", callback_data=f"delete_selected:{folder}"
+            )])
+        cancel = f"item:{folder}" if path else repo_callback(self.callbacks, repo_name)
+        keyboard.append([InlineKeyboardButton("✖️ Отмена", callback_data=cancel)])
         
         return keyboard
\ No newline at end of file
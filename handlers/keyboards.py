@@ -0,0 +1,47 @@
+from typing import List, Dict, Any, Tuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config import config
+from services.callback_registry import CallbackRegistry, CallbackEntry
+
+def page_slice(items: List[Any], page: int, page_size: int) -> Tuple[List[Any], int, int]:
+    """Элементы страницы, номер страницы (с учётом границ) и число страниц"""
+    pages = max(1, (len(items) + page_size - 1) // page_size)
+    page = min(max(page, 0), pages - 1)
+    return items[page * page_size:(page + 1) * page_size], page, pages
+
+
+def navigation_row(callback_prefix: str, page: int, pages: int) -> List[InlineKeyboardButton]:
+    """Кнопки ⬅️ N/M ➡️ (callback_data: <prefix><номер страницы>)"""
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("⬅️", callback_data=f"{callback_prefix}{page - 1}"))
+    navigation.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="noop"))
+    if page < pages - 1:
+        navigation.append(InlineKeyboardButton("➡️", callback_data=f"{callback_prefix}{page + 1}"))
+    return navigation
+
+
+def repo_callback(callbacks: CallbackRegistry, repo_full_name: str) -> str:
+    """callback_data кнопки открытия репозитория (имя может не влезть в 64 байта)"""
+    return f"repo:{callbacks.register(CallbackEntry(repo_full_name, '', 'repo'))}"
+
+
+def build_repos_keyboard(repos: List[Dict[str, Any]], callbacks: CallbackRegistry,
+                         page: int = 0) -> InlineKeyboardMarkup:
+    """Клавиатура со страницей репозиториев и кнопками перелистывания"""
+    page_repos, page, pages = page_slice(repos, page, config.MAX_REPOS_DISPLAY)
+
+    keyboard = []
+    for repo in page_repos:
+        button_text = f"📁 {repo['name']}"
+        if repo['private']:
+            button_text += " 🔒"
+        keyboard.append([InlineKeyboardButton(
+            button_text,
+            callback_data=repo_callback(callbacks, repo['full_name'])
+        )])
+
+    if pages > 1:
+        keyboard.append(navigation_row("repos_page:", page, pages))
+
+    return InlineKeyboardMarkup(keyboard)
@@ -0,0 +1,9 @@
+import math
+from services.github_service import GitHubService
+
+def github_error_text(github_service: GitHubService, token: str, default: str) -> str:
+    """Текст ошибки GitHub: отдельно сообщаем, если исчерпан лимит запросов"""
+    wait = github_service.retry_after(token)
+    if wait > 0:
+        return f"⏳ Лимит запросов GitHub исчерпан. Попробуй через {math.ceil(wait / 60)} мин."
+    return default
@@ -1,20 +1,34 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from typing import Optional
+from telegram import Update
+from telegram.ext import ContextTypes, ConversationHandler
 from services.user_service import UserService
 from services.github_service import GitHubService
+from services.bot_stats import BotStatsService
+from services.repo_watcher import RepoWatcher
+from services.callback_registry import CallbackRegistry
+from services.persistence import BufferedPersistence
 from config import config
+from services.metrics import timed_handler
+from handlers.keyboards import build_repos_keyboard
+from handlers.messages import github_error_text
 
 class ReposHandler:
     """Обработчик команды /repos"""
     
-    def __init__(self, user_service: UserService, github_service: GitHubService):
+    def __init__(self, user_service: UserService, github_service: GitHubService, callbacks: CallbackRegistry,
+                 bot_stats: BotStatsService, watcher: RepoWatcher):
         self.user_service = user_service
         self.github_service = github_service
+        self.callbacks = callbacks
+        self.bot_stats = bot_stats
+        self.watcher = watcher
+        self.admin_ids = {int(user_id) for user_id in config.ADMIN_IDS.split(',') if user_id.strip()}
     
+    @timed_handler('show_repos')
     async def show_repos(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Показать список репозиториев"""
         user_id = update.effective_user.id
-        token = self.user_service.get_token(user_id)
+        token = await self.user_service.get_token(user_id)
         
         if not token:
             await update.message.reply_text("❌ Сначала отправь токен через /start")
@@ -22,35 +36,28 @@ class ReposHandler:
         
         await update.message.reply_text("🔄 Загружаю репозитории...")
         
-        repos = self.github_service.get_repositories(token)
+        repos = await self.github_service.get_repositories(token)
         
         if not repos:
-            await update.message.reply_text("❌ Не удалось получить репозитории")
+            await update.message.reply_text(github_error_text(
+                self.github_service, token, "❌ Не удалось получить репозитории"
+            ))
             return
         
         self.user_service.log_action(user_id, 'view_repos')
+        await self.user_service.set_repos(user_id, repos)
         
-        keyboard = []
-        for repo in repos[:config.MAX_REPOS_DISPLAY]:
-            button_text = f"📁 {repo['name']}"
-            if repo['private']:
-                button_text += " 🔒"
-            
-            keyboard.append([InlineKeyboardButton(
-                button_text,
-                callback_data=f"repo:{repo['full_name']}"
-            )])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = build_repos_keyboard(repos, self.callbacks)
         await update.message.reply_text(
             f"📦 Твои репозитории ({len(repos)}):",
             reply_markup=reply_markup
         )
     
+    @timed_handler('show_stats')
     async def show_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Показать статистику пользователя"""
         user_id = update.effective_user.id
-        stats = self.user_service.get_stats(user_id)
+        stats = await self.user_service.get_stats(user_id)
         
         text = "📊 Твоя статистика:\n\n"
         text += f"Всего действий: {stats['total_actions']}\n\n"
@@ -69,9 +76,33 @@ class ReposHandler:
                     text += f" ({action['repo_name']})"
                 text += "\n"
         
-        # Общая статистика бота
-        total_users = self.user_service.get_users_count()
-        text += f"\n👥 Всего пользователей бота: {total_users}"
+        # Общая статистика бота (из памяти, считается в фоне)
+        total_users = self.bot_stats.total_users()
+        if total_users is not None:
+            text += f"\n👥 Всего пользователей бота: {total_users}"
+        
+        await update.message.reply_text(text)
+    
+    @timed_handler('bot_stats')
+    async def show_bot_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Показать общую статистику бота (только для ADMIN_IDS)"""
+        if update.effective_user.id not in self.admin_ids:
+            await update.message.reply_text("⛔ Команда доступна только администраторам")
+            return
+        
+        stats = self.bot_stats.stats
+        if stats is None:
+            await update.message.reply_text("⏳ Статистика ещё считается, попробуй позже")
+            return
+        
+        prefix = "~" if stats.get('estimated') else ""
+        text = "🤖 Статистика бота:\n\n"
+        text += f"👥 Всего пользователей: {prefix}{stats['total_users']}\n"
+        text += f"🔑 С токеном: {prefix}{stats['users_with_tokens']}\n"
+        text += f"📅 Активных за сутки: {stats['daily_active_users']}\n"
+        text += f"🗓 Активных за неделю: {stats['weekly_active_users']}\n"
+        text += f"⚡ Действий за сутки: {stats['actions_per_day']}\n"
+        text += f"\n🕐 Обновлено {int(self.bot_stats.age())} с назад"
         
         await update.message.reply_text(text)
     
@@ -83,21 +114,33 @@ class ReposHandler:
             'open_repo': '📁',
             'open_folder': '📂',
             'view_file': '📄',
+            'download_file': '📥',
+            'find_file': '🔍',
+            'watch_repo': '👀',
+            'unwatch_repo': '🔕',
             'delete_file': '🗑',
             'create_file': '➕'
         }
         return emojis.get(action_type, '•')
     
-    async def delete_user_data(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Удалить данные пользователя"""
+    @timed_handler('delete_data')
+    async def delete_user_data(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
+        """Удалить данные пользователя (диалог завершается, его состояние тоже удаляется)"""
         user_id = update.effective_user.id
         
-        if self.user_service.delete_user(user_id):
+        if await self.user_service.delete_user(user_id):
+            self.watcher.forget_user(user_id)
+            context.application.drop_user_data(user_id)
+            context.application.drop_chat_data(update.effective_chat.id)
+            if isinstance(context.application.persistence, BufferedPersistence):
+                await context.application.persistence.forget_user(user_id)
             await update.message.reply_text(
                 "✅ Все твои данные удалены из Supabase.\n"
                 "Используй /start чтобы начать заново."
             )
-        else:
-            await update.message.reply_text(
-                "❌ Ошибка при удалении данных. Попробуй позже."
-            )
\ No newline at end of file
+            return ConversationHandler.END
+        
+        await update.message.reply_text(
+            "❌ Ошибка при удалении данных. Попробуй позже."
+        )
+        return None
\ No newline at end of file
@@ -0,0 +1,69 @@
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from config import config
+from services.user_service import UserService
+from services.github_service import GitHubService
+from services.callback_registry import CallbackRegistry, CallbackEntry
+from services.path_index import MIN_QUERY_LENGTH
+from services.metrics import timed_handler
+from handlers.messages import github_error_text
+
+# длинные пути в кнопке обрезаются слева - имя файла важнее
+BUTTON_PATH_LENGTH = 60
+
+
+class SearchHandler:
+    """Обработчик команды /find - поиск файлов по пути в текущем репозитории"""
+
+    def __init__(self, user_service: UserService, github_service: GitHubService,
+                 callbacks: CallbackRegistry):
+        self.user_service = user_service
+        self.github_service = github_service
+        self.callbacks = callbacks
+
+    @timed_handler('find')
+    async def find(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Найти файлы по части пути: /find <запрос>"""
+        user_id = update.effective_user.id
+        query = ' '.join(context.args or [])
+
+        if max((len(term) for term in query.split()), default=0) < MIN_QUERY_LENGTH:
+            await update.message.reply_text(
+                f"🔍 Использование: /find <часть пути>\n"
+                f"Хотя бы одно слово не короче {MIN_QUERY_LENGTH} символов"
+            )
+            return
+
+        token = await self.user_service.get_token(user_id)
+        if not token:
+            await update.message.reply_text("❌ Сначала отправь токен через /start")
+            return
+
+        repo_name = await self.user_service.get_current_repo(user_id)
+        if not repo_name:
+            await update.message.reply_text("📦 Сначала открой репозиторий через /repos")
+            return
+
+        index = await self.github_service.load_path_index(token, repo_name)
+        if index is None:
+            await update.message.reply_text(github_error_text(
+                self.github_service, token, "❌ Не удалось загрузить дерево репозитория"
+            ))
+            return
+
+        self.user_service.log_action(user_id, 'find_file', repo_name)
+        results = index.search(query, config.FIND_MAX_RESULTS)
+        if not results:
+            await update.message.reply_text(f"🔍 В {repo_name} ничего не найдено по запросу «{query}»")
+            return
+
+        keyboard = []
+        for path, sha, size in results:
+            entry_id = self.callbacks.register(CallbackEntry(repo_name, path, 'file', sha, size))
+            label = path if len(path) <= BUTTON_PATH_LENGTH else '…' + path[-BUTTON_PATH_LENGTH:]
+            keyboard.append([InlineKeyboardButton(f"📄 {label}", callback_data=f"item:{entry_id}")])
+
+        text = f"🔍 {repo_name}: «{query}»"
+        if index.truncated:
+            text += "\n⚠️ Репозиторий слишком большой, поиск идёт не по всем файлам"
+        await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
@@ -2,6 +2,7 @@ from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from services.user_service import UserService
 from services.github_service import GitHubService
+from services.metrics import timed_handler
 
 WAITING_TOKEN, BROWSING = range(2)
 
@@ -12,12 +13,13 @@ class StartHandler:
         self.user_service = user_service
         self.github_service = github_service
     
+    @timed_handler('start')
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Команда /start"""
         user_name = update.effective_user.first_name
         user_id = update.effective_user.id
 
-        self.user_service.ensure_user_exists(user_id)
+        await self.user_service.ensure_user_exists(user_id)
         
         await update.message.reply_text(
             f"👋 Привет, {user_name}! Я бот для работы с GitHub.\n\n"
@@ -31,6 +33,7 @@ class StartHandler:
         )
         return WAITING_TOKEN
     
+    @timed_handler('receive_token')
     async def receive_token(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Получение и проверка токена"""
         token = update.message.text.strip()
@@ -43,7 +46,7 @@ class StartHandler:
             pass
         
         # Проверяем токен
-        if not self.github_service.validate_token(token):
+        if not await self.github_service.validate_token(token):
             await context.bot.send_message(
                 chat_id=update.effective_chat.id,
                 text="❌ Неверный токен! Попробуй ещё раз или используй /start"
@@ -51,11 +54,11 @@ class StartHandler:
             return WAITING_TOKEN
         
         # Получаем инфо пользователя GitHub
-        github_user = self.github_service.get_user_info(token)
+        github_user = await self.github_service.get_user_info(token)
         github_username = github_user['login'] if github_user else "Unknown"
         
         # Сохраняем токен (зашифрованный)
-        if self.user_service.save_token(user_id, token):
+        if await self.user_service.save_token(user_id, token):
             self.user_service.log_action(user_id, 'token_saved')
             
             await context.bot.send_message(
@@ -64,6 +67,8 @@ class StartHandler:
                      f"👤 GitHub: @{github_username}\n\n"
                      "Команды:\n"
                      "/repos - Репозитории\n"
+                     "/find - Поиск файла в репозитории\n"
+                     "/watch - Следить за репозиторием\n"
                      "/stats - Статистика\n"
                      "/delete_data - Удалить мои данные\n"
                      "/help - Помощь"
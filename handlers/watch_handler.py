@@ -0,0 +1,70 @@
+from telegram import Update
+from telegram.ext import ContextTypes
+from services.user_service import UserService
+from services.repo_watcher import RepoWatcher
+from services.metrics import timed_handler
+
+class WatchHandler:
+    """Обработчик команд /watch и /unwatch для текущего репозитория"""
+
+    def __init__(self, user_service: UserService, watcher: RepoWatcher):
+        self.user_service = user_service
+        self.watcher = watcher
+
+    @timed_handler('watch')
+    async def watch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Подписаться на коммиты, PR и issues текущего репозитория"""
+        user_id = update.effective_user.id
+        repo_name = await self.user_service.get_current_repo(user_id)
+        if not repo_name:
+            await update.message.reply_text("📦 Сначала открой репозиторий через /repos")
+            return
+
+        watched = await self.watcher.watched_by(user_id)
+        if watched is None:
+            await update.message.reply_text("❌ Не удалось прочитать подписки. Попробуй позже.")
+            return
+        if repo_name in watched:
+            await update.message.reply_text(f"👀 Ты уже следишь за {repo_name}")
+            return
+        if len(watched) >= self.watcher.max_per_user:
+            await update.message.reply_text(
+                f"❌ Можно следить не больше чем за {self.watcher.max_per_user} репозиториями"
+            )
+            return
+
+        watching = await self.watcher.watch(user_id, repo_name)
+        if watching:
+            self.user_service.log_action(user_id, 'watch_repo', repo_name)
+            await update.message.reply_text(
+                f"👀 Слежу за {repo_name}: пришлю новые коммиты, PR и issues.\n"
+                "Отписаться: /unwatch"
+            )
+        elif watching is None:
+            await update.message.reply_text(
+                f"❌ Не удалось подтвердить доступ твоего токена к {repo_name}. Попробуй позже."
+            )
+        else:
+            await update.message.reply_text("❌ Не удалось сохранить подписку. Попробуй позже.")
+
+    @timed_handler('unwatch')
+    async def unwatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Отписаться от текущего репозитория"""
+        user_id = update.effective_user.id
+        repo_name = await self.user_service.get_current_repo(user_id)
+        if not repo_name:
+            await update.message.reply_text("ℹ️ Ты не следишь за текущим репозиторием")
+            return
+        watched = await self.watcher.watched_by(user_id)
+        if watched is None:
+            await update.message.reply_text("❌ Не удалось прочитать подписки. Попробуй позже.")
+            return
+        if repo_name not in watched:
+            await update.message.reply_text("ℹ️ Ты не следишь за текущим репозиторием")
+            return
+
+        if await self.watcher.unwatch(user_id, repo_name):
+            self.user_service.log_action(user_id, 'unwatch_repo', repo_name)
+            await update.message.reply_text(f"🔕 Больше не слежу за {repo_name}")
+        else:
+            await update.message.reply_text("❌ Не удалось удалить подписку. Попробуй позже.")
@@ -1,37 +1,76 @@
+import time
+_STARTED_AT = time.perf_counter()
+
+import argparse
+import asyncio
+import re
+from dataclasses import dataclass
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, \
                          MessageHandler, filters, ConversationHandler
+_TELEGRAM_IMPORTED_AT = time.perf_counter()
 
 from config import config
 from services.supabase_service import SupabaseService
 from services.user_service import UserService
 from services.github_service import GitHubService
+from services.callback_registry import CallbackRegistry
+from services.bot_stats import BotStatsService
+from services.repo_watcher import RepoWatcher
+from services.startup_profiler import StartupProfiler
+from services.metrics import metrics, cache_collector, LoopLagMonitor
 from handlers.start_handler import StartHandler, WAITING_TOKEN, BROWSING
 from handlers.repos_handler import ReposHandler
 from handlers.callback_handler import CallbackHandler
+from handlers.search_handler import SearchHandler
+from handlers.watch_handler import WatchHandler
+_IMPORTED_AT = time.perf_counter()
 
 
-def main():
-    """Главная функция запуска бота"""
-    
-    print("=" * 60)
-    print("🤖 Telegram GitHub Bot with Supabase")
-    print("=" * 60)
-    
-    # Инициализация сервисов
-    print("📦 Инициализация сервисов...")
+@dataclass
+class Services:
+    """Сервисы бота (собираются одинаково для запуска и для benchmarks)"""
+    supabase: SupabaseService
+    users: UserService
+    github: GitHubService
+    callbacks: CallbackRegistry
+    bot_stats: BotStatsService
+    watcher: RepoWatcher
+
+
+def build_services() -> Services:
+    """Создать сервисы (тяжёлые клиенты создаются при первом обращении)"""
     supabase_service = SupabaseService()
     user_service = UserService(supabase_service)
     github_service = GitHubService()
-    
-    # Инициализация обработчиков
-    print("🔧 Инициализация обработчиков...")
-    start_handler = StartHandler(user_service, github_service)
-    repos_handler = ReposHandler(user_service, github_service)
-    callback_handler = CallbackHandler(user_service, github_service)
-    
-    # Создание приложения
-    print("🚀 Создание Telegram приложения...")
-    app = Application.builder().token(config.BOT_TOKEN).build()
+    watcher = RepoWatcher(
+        supabase_service, user_service, github_service,
+        min_interval=config.WATCH_MIN_INTERVAL,
+        max_interval=config.WATCH_MAX_INTERVAL,
+        tick=config.WATCH_TICK_INTERVAL,
+        concurrency=config.WATCH_CONCURRENCY,
+        max_per_user=config.WATCH_MAX_PER_USER,
+        access_ttl=config.WATCH_ACCESS_TTL,
+        lease_ttl=config.WATCH_LEASE_TTL,
+        reload_interval=config.WATCH_RELOAD_INTERVAL
+    )
+    return Services(
+        supabase=supabase_service,
+        users=user_service,
+        github=github_service,
+        callbacks=CallbackRegistry(config.CALLBACK_REGISTRY_SIZE, config.CALLBACK_REGISTRY_TTL),
+        bot_stats=BotStatsService(supabase_service, config.BOT_STATS_INTERVAL, config.BOT_STATS_EXACT_LIMIT),
+        watcher=watcher
+    )
+
+
+def register_handlers(app: Application, services: Services, persistent: bool = False) -> None:
+    """Создать обработчики и зарегистрировать их в приложении"""
+    start_handler = StartHandler(services.users, services.github)
+    repos_handler = ReposHandler(services.users, services.github, services.callbacks,
+                                 services.bot_stats, services.watcher)
+    callback_handler = CallbackHandler(services.users, services.github, services.callbacks)
+    search_handler = SearchHandler(services.users, services.github, services.callbacks)
+    watch_handler = WatchHandler(services.users, services.watcher)
     
     # Conversation handler для /start
     conv_handler = ConversationHandler(
@@ -42,19 +81,142 @@ def main():
             ],
             BROWSING: [
                 CommandHandler('repos', repos_handler.show_repos),
+                CommandHandler('find', search_handler.find),
+                CommandHandler('watch', watch_handler.watch),
+                CommandHandler('unwatch', watch_handler.unwatch),
                 CommandHandler('stats', repos_handler.show_stats),
+                CommandHandler('botstats', repos_handler.show_bot_stats),
                 CommandHandler('delete_data', repos_handler.delete_user_data)
             ]
         },
-        fallbacks=[CommandHandler('start', start_handler.start)]
+        fallbacks=[CommandHandler('start', start_handler.start)],
+        name='main',
+        persistent=persistent
     )
     
-    # Регистрация обработчиков
     app.add_handler(conv_handler)
     app.add_handler(CommandHandler('repos', repos_handler.show_repos))
+    app.add_handler(CommandHandler('find', search_handler.find))
+    app.add_handler(CommandHandler('watch', watch_handler.watch))
+    app.add_handler(CommandHandler('unwatch', watch_handler.unwatch))
     app.add_handler(CommandHandler('stats', repos_handler.show_stats))
+    app.add_handler(CommandHandler('botstats', repos_handler.show_bot_stats))
     app.add_handler(CommandHandler('delete_data', repos_handler.delete_user_data))
     app.add_handler(CallbackQueryHandler(callback_handler.handle_callback))
+
+
+def main():
+    """Главная функция запуска бота"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='показать время импорта и инициализации по этапам')
+    args = parser.parse_args()
+    
+    if config.BOT_MODE == 'webhook' and not re.fullmatch(r'[A-Za-z0-9_-]{1,256}', config.WEBHOOK_SECRET):
+        # без секрета любой, кто узнал адрес, может слать обновления от имени пользователей
+        print("❌ Для режима webhook задай WEBHOOK_SECRET (1-256 символов: A-Z, a-z, 0-9, _ и -)")
+        return
+    
+    profiler = StartupProfiler(_STARTED_AT)
+    profiler.mark('импорт telegram', _TELEGRAM_IMPORTED_AT)
+    profiler.mark('импорт сервисов и обработчиков', _IMPORTED_AT)
+    
+    print("=" * 60)
+    print("🤖 Telegram GitHub Bot with Supabase")
+    print("=" * 60)
+    
+    # Инициализация сервисов
+    print("📦 Инициализация сервисов...")
+    services = build_services()
+    supabase_service = services.supabase
+    user_service = services.users
+    github_service = services.github
+    bot_stats = services.bot_stats
+    watcher = services.watcher
+    profiler.mark('инициализация сервисов')
+    
+    # Метрики: счётчики кэшей и очередей читаются при запросе /metrics
+    metrics.register_collector(cache_collector('github_responses', github_service.cache.stats))
+    metrics.register_collector(cache_collector('repo_trees', github_service.trees.stats))
+    metrics.register_collector(cache_collector('tokens', user_service.tokens.stats))
+    metrics.register_collector(cache_collector('callbacks', services.callbacks.stats))
+
+    def collect_queues():
+        flight = github_service.single_flight.stats()
+        yield 'github_single_flight_calls_total', {}, flight['calls']
+        yield 'github_single_flight_coalesced_total', {}, flight['coalesced']
+        action_log = user_service.action_log.stats()
+        yield 'action_log_queued', {}, action_log['queued'] + action_log['retry']
+        yield 'action_log_written_total', {}, action_log['written']
+        yield 'action_log_dropped_total', {}, action_log['dropped']
+
+    metrics.register_collector(collect_queues)
+    loop_lag = LoopLagMonitor(config.LOOP_LAG_INTERVAL)
+    background_tasks = []
+    metrics_server = None
+    if config.METRICS_PORT:
+        # aiohttp нужен только если метрики включены
+        from services.metrics_server import MetricsServer
+        metrics_server = MetricsServer(config.METRICS_LISTEN, config.METRICS_PORT, config.METRICS_PATH)
+
+    
+    # Создание приложения
+    print("🚀 Создание Telegram приложения...")
+    async def print_users_count() -> None:
+        await supabase_service.warm_up()
+        # первый подсчёт статистики бота, дальше её обновляет JobQueue
+        if await bot_stats.refresh():
+            print(f"👤 Всего пользователей: {bot_stats.total_users()}")
+
+    async def post_init(application: Application) -> None:
+        user_service.start()
+        loop_lag.start()
+        if config.TOKEN_ROTATION_ENABLED:
+            # перешифровка токенов новым ключом идёт в фоне, бот работает как обычно;
+            # не через application.create_task - иначе остановка ждала бы конца прохода
+            from services.token_rotation import create_job
+            background_tasks.append(asyncio.create_task(create_job(supabase_service).run()))
+        if metrics_server is not None:
+            await metrics_server.start()
+        # Статистика для баннера не задерживает приём обновлений
+        application.create_task(print_users_count())
+        bot_stats.schedule(application.job_queue, first=config.BOT_STATS_INTERVAL)
+        # подписки /watch читает из БД тот экземпляр, который получит аренду опроса
+        watcher.schedule(application.job_queue)
+        profiler.mark('initialize (getMe, persistence)')
+        if args.profile_startup:
+            print(profiler.report())
+
+    async def post_shutdown(application: Application) -> None:
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        if metrics_server is not None:
+            await metrics_server.stop()
+        await loop_lag.stop()
+        await watcher.stop()
+        await github_service.close()
+        await user_service.close()
+        supabase_service.close()
+
+    builder = Application.builder().token(config.BOT_TOKEN) \
+        .post_init(post_init).post_shutdown(post_shutdown)
+    if config.PERSISTENCE_BACKEND == 'sqlite':
+        from services.persistence import SQLitePersistence
+        builder.persistence(SQLitePersistence(
+            config.PERSISTENCE_SQLITE_PATH, config.PERSISTENCE_FLUSH_INTERVAL
+        ))
+    elif config.PERSISTENCE_BACKEND == 'supabase':
+        from services.persistence import SupabasePersistence
+        builder.persistence(SupabasePersistence(
+            supabase_service, config.PERSISTENCE_FLUSH_INTERVAL
+        ))
+    app = builder.build()
+    
+    # Регистрация обработчиков
+    print("🔧 Инициализация обработчиков...")
+    register_handlers(app, services, persistent=bool(config.PERSISTENCE_BACKEND))
+    profiler.mark('сборка приложения')
     
     # Запуск бота
     print("=" * 60)
@@ -62,13 +224,28 @@ def main():
     print(f"🗄️  База данных: Supabase")
     print(f"🔒 Шифрование: Активно (Fernet)")
     print(f"📋 Макс. репозиториев: {config.MAX_REPOS_DISPLAY}")
-    print(f"👤 Всего пользователей: {user_service.get_users_count()}")
     print("=" * 60)
     print("⌨️  Нажми Ctrl+C для остановки")
     print("=" * 60)
     
-    app.run_polling()
+    if config.BOT_MODE == 'webhook':
+        # aiohttp нужен только в этом режиме
+        from services.webhook_server import WebhookServer
+        server = WebhookServer(
+            app,
+            listen=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            path=config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            public_url=config.WEBHOOK_URL,
+            drain_timeout=config.WEBHOOK_DRAIN_TIMEOUT,
+            # webhook сервер открыт в интернет: /metrics на нём только по явному METRICS_ON_WEBHOOK
+            metrics_path=config.METRICS_PATH if config.METRICS_ON_WEBHOOK and not metrics_server else None
+        )
+        asyncio.run(server.serve())
+    else:
+        app.run_polling()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
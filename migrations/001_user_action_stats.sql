@@ -0,0 +1,59 @@
+-- /stats uchun foydalanuvchi harakatlari hisoblagichlari.
+-- action_history ga yozilganda trigger hisoblagichlarni oshiradi, shuning uchun
+-- get_user_stats() tarix uzunligiga emas, harakat turlari soniga bog'liq.
+
+create table if not exists user_action_counters (
+    user_id bigint not null references users (user_id) on delete cascade,
+    action_type text not null,
+    count bigint not null default 0,
+    primary key (user_id, action_type)
+);
+
+-- oxirgi harakatlar uchun
+create index if not exists action_history_user_created_idx
+    on action_history (user_id, created_at desc);
+
+-- bitta INSERT bilan kelgan barcha qatorlar (paketli yozish) bir marta qayta ishlanadi
+create or replace function bump_user_action_counters() returns trigger
+language plpgsql as $$
+begin
+    insert into user_action_counters (user_id, action_type, count)
+    select user_id, action_type, count(*)
+    from new_rows
+    group by user_id, action_type
+    on conflict (user_id, action_type)
+    do update set count = user_action_counters.count + excluded.count;
+    return null;
+end
+$$;
+
+drop trigger if exists action_history_counters on action_history;
+create trigger action_history_counters
+    after insert on action_history
+    referencing new table as new_rows
+    for each statement execute function bump_user_action_counters();
+
+-- mavjud tarixdan hisoblagichlarni to'ldirish
+insert into user_action_counters (user_id, action_type, count)
+select user_id, action_type, count(*)
+from action_history
+group by user_id, action_type
+on conflict (user_id, action_type) do update set count = excluded.count;
+
+-- /stats uchun hammasi bitta so'rovda
+create or replace function get_user_stats(p_user_id bigint) returns jsonb
+language sql stable as $$
+    select jsonb_build_object(
+        'total_actions', coalesce(
+            (select sum(count) from user_action_counters where user_id = p_user_id), 0),
+        'actions_by_type', coalesce(
+            (select jsonb_object_agg(action_type, count)
+             from user_action_counters where user_id = p_user_id), '{}'::jsonb),
+        'recent_actions', coalesce(
+            (select jsonb_agg(r order by r.created_at desc)
+             from (select * from action_history
+                   where user_id = p_user_id
+                   order by created_at desc
+                   limit 5) r), '[]'::jsonb)
+    )
+$$;
@@ -0,0 +1,23 @@
+-- ConversationHandler holati bot qayta ishga tushganda tiklanadi (services/persistence.py
+-- dagi SupabasePersistence). Holat faqat ishga tushishda o'qiladi, shuning uchun bir vaqtda
+-- ishlayotgan nusxalar o'rtasida umumiy emas. bot_user_data/bot_chat_data hozircha yozilmaydi.
+
+create table if not exists bot_conversations (
+    name text not null,
+    key text not null,
+    state jsonb not null,
+    updated_at timestamptz not null default now(),
+    primary key (name, key)
+);
+
+create table if not exists bot_user_data (
+    user_id bigint primary key,
+    data jsonb not null default '{}'::jsonb,
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists bot_chat_data (
+    chat_id bigint primary key,
+    data jsonb not null default '{}'::jsonb,
+    updated_at timestamptz not null default now()
+);
@@ -0,0 +1,19 @@
+-- Shifrlash kalitini almashtirish: services/token_rotation.py qayta shifrlangan
+-- tokenlarni paket bilan shu funksiya orqali yozadi. Qator faqat token o'qilgandan
+-- beri o'zgarmagan bo'lsa yangilanadi (foydalanuvchi shu orada yangi token
+-- saqlagan bo'lsa, uning tokeni ustiga yozilmaydi).
+
+create or replace function rotate_user_tokens(rows jsonb)
+returns integer
+language sql
+as $$
+    with updated as (
+        update users u
+        set github_token_encrypted = r.new_token
+        from jsonb_to_recordset(rows) as r(user_id bigint, old_token text, new_token text)
+        where u.user_id = r.user_id
+          and u.github_token_encrypted = r.old_token
+        returning 1
+    )
+    select count(*)::integer from updated;
+$$;
@@ -0,0 +1,43 @@
+-- /botstats va /stats uchun bot bo'yicha umumiy statistika.
+-- BotStatsService uni fonda chaqiradi, natija xotirada saqlanadi.
+-- users jadvali katta bo'lsa (pg_class.reltuples bo'yicha p_exact_limit dan ko'p)
+-- to'liq count(*) o'rniga taxminiy qiymat qaytariladi.
+
+-- kunlik/haftalik faol foydalanuvchilar va kunlik harakatlar uchun
+create index if not exists action_history_created_idx
+    on action_history (created_at);
+
+create or replace function get_bot_stats(p_exact_limit bigint default 100000) returns jsonb
+language plpgsql stable as $$
+declare
+    estimated bigint;
+    total bigint;
+    with_tokens bigint;
+begin
+    -- hech qachon ANALYZE qilinmagan jadvalda reltuples = -1
+    select greatest(reltuples, 0)::bigint into estimated
+    from pg_class where oid = 'public.users'::regclass;
+
+    if estimated < p_exact_limit then
+        select count(*), count(github_token_encrypted) into total, with_tokens from users;
+    else
+        total := estimated;
+        -- 1% sahifalar namunasi bo'yicha ulush
+        select coalesce(count(github_token_encrypted)::float8 / nullif(count(*), 0), 0) * estimated
+        into with_tokens
+        from users tablesample system (1);
+    end if;
+
+    return jsonb_build_object(
+        'total_users', total,
+        'users_with_tokens', with_tokens,
+        'estimated', estimated >= p_exact_limit,
+        'daily_active_users', (select count(distinct user_id) from action_history
+                               where created_at >= now() - interval '1 day'),
+        'weekly_active_users', (select count(distinct user_id) from action_history
+                                where created_at >= now() - interval '7 days'),
+        'actions_per_day', (select count(*) from action_history
+                            where created_at >= now() - interval '1 day')
+    );
+end
+$$;
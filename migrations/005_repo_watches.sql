@@ -0,0 +1,14 @@
+-- /watch obunalari: qaysi foydalanuvchi qaysi repozitoriyni kuzatadi.
+-- RepoWatcher ishga tushganda hammasini o'qiydi va har bir repozitoriyni
+-- obunachilar soniga qaramay bir marta so'raydi.
+
+create table if not exists repo_watches (
+    user_id bigint not null references users (user_id) on delete cascade,
+    repo_name text not null,
+    created_at timestamptz not null default now(),
+    primary key (user_id, repo_name)
+);
+
+-- repozitoriy obunachilarini topish uchun
+create index if not exists repo_watches_repo_idx
+    on repo_watches (repo_name);
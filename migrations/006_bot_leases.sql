@@ -0,0 +1,29 @@
+-- Bir nechta bot nusxasi ishlaganda fon ishini faqat bittasi bajarishi uchun ijara (lease).
+-- RepoWatcher har tikda acquire_lease('repo_watcher', ...) chaqiradi: ijara bo'sh, muddati
+-- o'tgan yoki allaqachon shu nusxaniki bo'lsa - uzaytiriladi va true qaytadi.
+-- Shunda repozitoriylarni faqat bitta nusxa so'raydi va xabar ikki marta yuborilmaydi.
+
+create table if not exists bot_leases (
+    name text primary key,
+    holder text not null,
+    expires_at timestamptz not null
+);
+
+create or replace function acquire_lease(p_name text, p_holder text, p_ttl_seconds double precision)
+returns boolean
+language plpgsql as $$
+begin
+    insert into bot_leases (name, holder, expires_at)
+    values (p_name, p_holder, now() + make_interval(secs => p_ttl_seconds))
+    on conflict (name) do update
+        set holder = excluded.holder, expires_at = excluded.expires_at
+        where bot_leases.holder = excluded.holder or bot_leases.expires_at < now();
+    return found;
+end;
+$$;
+
+-- to'xtashda ijarani bo'shatish: keyingi nusxa muddat tugashini kutmaydi
+create or replace function release_lease(p_name text, p_holder text) returns void
+language sql as $$
+    delete from bot_leases where name = p_name and holder = p_holder;
+$$;
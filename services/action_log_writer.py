@@ -0,0 +1,153 @@
+import asyncio
+from typing import Optional, List, Dict, Any
+from services.supabase_service import SupabaseService
+
+class ActionLogWriter:
+    """Фоновая пакетная запись истории действий в action_history"""
+
+    # после стольких неудачных попыток буфер повторов отбрасывается
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, db: SupabaseService, queue_size: int, batch_size: int,
+                 flush_interval: float, retry_limit: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_limit = retry_limit
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._retry: List[Dict[str, Any]] = []
+        # собираемый пакет (уже вынут из очереди, ещё не записан)
+        self._batch: List[Dict[str, Any]] = []
+        # запись и forget_user не пересекаются
+        self._lock = asyncio.Lock()
+        self._attempts = 0
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    def log(self, user_id: int, action_type: str,
+            repo_name: str = None, file_path: str = None) -> bool:
+        """Поставить событие в очередь (не блокирует; при переполнении событие теряется)"""
+        if self._closing:
+            return False
+        try:
+            self._queue.put_nowait({
+                'user_id': user_id,
+                'action_type': action_type,
+                'repo_name': repo_name,
+                'file_path': file_path
+            })
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def _next_batch(self) -> None:
+        """Собрать пакет: до batch_size событий или до истечения flush_interval"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(self._batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Записать строки; при ошибке пакет делится пополам, чтобы найти плохие строки.
+        Возвращает незаписанные строки"""
+        if await self.db.insert_actions(rows):
+            self.written += len(rows)
+            return []
+        if len(rows) == 1:
+            return rows
+        middle = len(rows) // 2
+        failed = await self._insert(rows[:middle])
+        if len(failed) < middle:
+            return failed + await self._insert(rows[middle:])
+        # первая половина не записалась целиком - вторую проверяем одним запросом:
+        # если и она не пишется, это недоступная БД, а не плохие строки
+        if await self.db.insert_actions(rows[middle:]):
+            self.written += len(rows) - middle
+            return failed
+        return rows
+
+    async def _write(self) -> None:
+        async with self._lock:
+            rows = self._retry + self._batch
+            self._retry, self._batch = [], []
+            if not rows:
+                return
+            failed = await self._insert(rows)
+            if not failed:
+                self._attempts = 0
+                return
+            if len(failed) < len(rows):
+                # остальное записалось - эти строки сами по себе плохие, повтор не поможет
+                print(f"❌ История действий: отброшено {len(failed)} событий, которые БД не принимает")
+                self.dropped += len(failed)
+                self._attempts = 0
+                return
+
+            self._attempts += 1
+            if self._attempts >= self.MAX_ATTEMPTS:
+                print(f"❌ История действий: отброшено {len(rows)} событий после {self._attempts} попыток")
+                self.dropped += len(rows)
+                self._attempts = 0
+                return
+            # Буфер повторов ограничен: самые старые события вытесняются
+            overflow = len(rows) - self.retry_limit
+            if overflow > 0:
+                self.dropped += overflow
+                rows = rows[overflow:]
+            self._retry = rows
+
+    async def forget_user(self, user_id: int) -> None:
+        """Выбросить ещё не записанные события пользователя (перед удалением его данных):
+        иначе они попали бы в БД уже после удаления"""
+        async with self._lock:
+            self._retry = [row for row in self._retry if row['user_id'] != user_id]
+            self._batch[:] = [row for row in self._batch if row['user_id'] != user_id]
+            queued = []
+            while not self._queue.empty():
+                row = self._queue.get_nowait()
+                if row['user_id'] != user_id:
+                    queued.append(row)
+            for row in queued:
+                self._queue.put_nowait(row)
+
+    async def _run(self) -> None:
+        while not self._closing or not self._queue.empty():
+            try:
+                await self._next_batch()
+                await self._write()
+            except Exception as e:
+                print(f"❌ Ошибка записи истории действий: {e}")
+
+    def start(self) -> None:
+        """Запустить фоновую запись"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Дописать очередь и буфер повторов и остановиться"""
+        self._closing = True
+        if self._task is not None:
+            await self._task
+            self._task = None
+        else:
+            await self._run()
+        if self._retry:
+            await self._write()
+
+    def stats(self) -> Dict[str, int]:
+        """Состояние очереди"""
+        return {
+            'queued': self._queue.qsize(),
+            'retry': len(self._retry),
+            'written': self.written,
+            'dropped': self.dropped
+        }
@@ -0,0 +1,47 @@
+import time
+from typing import Optional, Dict, Any
+from telegram.ext import ContextTypes, JobQueue
+from services.supabase_service import SupabaseService
+
+class BotStatsService:
+    """Общая статистика бота в памяти.
+
+    Агрегаты (всего пользователей, с токеном, DAU/WAU, действий за сутки)
+    считает БД одним RPC по расписанию JobQueue, обработчики читают только
+    последний результат и никогда не ждут подсчёта по всей таблице.
+    """
+
+    def __init__(self, db: SupabaseService, interval: float, exact_limit: int):
+        self.db = db
+        self.interval = interval
+        self.exact_limit = exact_limit
+        self.stats: Optional[Dict[str, Any]] = None
+        self.updated_at: Optional[float] = None
+
+    async def refresh(self) -> bool:
+        """Пересчитать статистику (при ошибке остаётся предыдущее значение)"""
+        stats = await self.db.get_bot_stats(self.exact_limit)
+        if stats is None:
+            return False
+        self.stats = stats
+        self.updated_at = time.time()
+        return True
+
+    async def _job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        await self.refresh()
+
+    def schedule(self, job_queue: Optional[JobQueue], first: float = 0) -> None:
+        """Обновлять статистику в фоне каждые interval секунд"""
+        if job_queue is None:
+            print("⚠️ JobQueue недоступен (pip install \"python-telegram-bot[job-queue]\"), "
+                  "статистика бота не обновляется")
+            return
+        job_queue.run_repeating(self._job, interval=self.interval, first=first, name='bot_stats')
+
+    def total_users(self) -> Optional[int]:
+        """Всего пользователей по последнему подсчёту (None - ещё не посчитано)"""
+        return self.stats['total_users'] if self.stats else None
+
+    def age(self) -> Optional[float]:
+        """Сколько секунд назад посчитана статистика"""
+        return time.time() - self.updated_at if self.updated_at else None
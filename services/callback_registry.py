@@ -0,0 +1,40 @@
+import base64
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+from services.cache import TTLCache
+
+@dataclass(frozen=True)
+class CallbackEntry:
+    """То, на что указывает кнопка"""
+    repo: str
+    path: str
+    type: str
+    sha: Optional[str] = None
+    size: int = 0
+
+
+class CallbackRegistry:
+    """Короткие id для callback_data (Telegram ограничивает его 64 байтами)"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self._entries = TTLCache(max_size, ttl)
+
+    @staticmethod
+    def _make_id(entry: CallbackEntry) -> str:
+        # id детерминирован: одна и та же кнопка не плодит новые записи
+        digest = hashlib.blake2b(repr(entry).encode(), digest_size=9).digest()
+        return base64.urlsafe_b64encode(digest).decode()
+
+    def register(self, entry: CallbackEntry) -> str:
+        """Сохранить запись и вернуть её id (12 символов)"""
+        entry_id = self._make_id(entry)
+        self._entries.set(entry_id, entry)
+        return entry_id
+
+    def resolve(self, entry_id: str) -> Optional[CallbackEntry]:
+        """Найти запись по id (None - устарела или вытеснена)"""
+        return self._entries.get(entry_id)
+
+    def stats(self):
+        return self._entries.stats()
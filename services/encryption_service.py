@@ -1,14 +1,53 @@
-from cryptography.fernet import Fernet
+import hashlib
 from config import config
 
 class EncryotionService:
     """shifrofka va deshifrofka"""
 
     def __init__(self) -> None:
-        if config.ENCRYPRION_KEY != None:
-            self.cipher = Fernet(config.ENCRYPRION_KEY.encode())
-        else:
+        self._cipher = None
+        self._primary = None
+        if config.ENCRYPRION_KEY == None:
             print("shirflash kodi bo'sh")
+
+    def _load_keys(self) -> None:
+        """Fernet birinchi kerak bo'lganda yaratiladi (cryptography importi sekin)"""
+        from cryptography.fernet import Fernet, MultiFernet
+        self._primary = Fernet(config.ENCRYPRION_KEY.encode())
+        old_keys = [Fernet(key.strip().encode()) for key in config.ENCRYPTION_OLD_KEYS.split(',') if key.strip()]
+        self._cipher = MultiFernet([self._primary, *old_keys])
+
+    @property
+    def cipher(self):
+        """shifrlash joriy kalit bilan, ochish - joriy va eski kalitlar bilan"""
+        if self._cipher is None:
+            self._load_keys()
+        return self._cipher
+
+    @property
+    def primary(self):
+        """faqat joriy kalit"""
+        if self._primary is None:
+            self._load_keys()
+        return self._primary
+
+    def key_id(self) -> str:
+        """joriy kalitning qisqa izi (kalitning o'zini oshkor qilmaydi)"""
+        return hashlib.sha256(config.ENCRYPRION_KEY.encode()).hexdigest()[:16]
+
+    def is_current(self, encrypted_data: str) -> bool:
+        """joriy kalit bilan shifrlanganmi"""
+        from cryptography.fernet import InvalidToken
+        try:
+            self.primary.decrypt(encrypted_data.encode())
+            return True
+        except InvalidToken:
+            return False
+
+    def rotate(self, encrypted_data: str) -> str:
+        """eski kalit bilan shifrlanganni joriy kalit bilan qayta shifrlash"""
+        return self.cipher.rotate(encrypted_data.encode()).decode()
+
     def encrypt(self, data: str) -> str:
         """ma'lumotlarni shifrlash"""
         enrypted = self.cipher.encrypt(data.encode())
@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+# ответы пишутся на диск пакетом через столько секунд после первого изменения
+WRITE_DELAY = 1.0
+
+def token_id(token: str) -> str:
+    """Идентификатор токена для ключей кэша (сам токен не хранится)"""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+@dataclass
+class CachedResponse:
+    """Ответ GitHub с валидаторами для условных запросов"""
+    body: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    # заголовок Link (пагинация)
+    link: Optional[str] = None
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class ResponseCache:
+    """LRU кэш ответов GitHub (ETag/Last-Modified) с необязательным SQLite на диске.
+
+    Диск работает в отдельном потоке: чтение с диска ждёт его результата, а
+    запись отложенная - изменения копятся в памяти (повторные изменения
+    одного ключа схлопываются) и через WRITE_DELAY секунд пишутся пакетом.
+    Сериализация тел ответов тоже идёт в потоке, event loop не блокируется.
+    """
+
+    def __init__(self, max_size: int, db_path: Optional[str] = None, max_disk_entries: int = 50000):
+        self.max_size = max_size
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        # незаписанные изменения диска: key -> ('set', запись) | ('touch', время) | ('delete', None)
+        self._pending: Dict[str, Tuple[str, Any]] = {}
+        self._write_task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        if db_path:
+            # один поток: запросы к соединению идут строго по очереди
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='github-cache')
+            self._db = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, '
+                'last_modified TEXT, stored_at REAL NOT NULL, link TEXT)'
+            )
+            try:
+                # файлы кэша, созданные до появления колонки link
+                self._db.execute('ALTER TABLE responses ADD COLUMN link TEXT')
+            except sqlite3.OperationalError:
+                pass
+
+    @staticmethod
+    def make_key(token: str, url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """Ключ кэша: хэш токена + URL с параметрами"""
+        query = urlencode(sorted(params.items())) if params else ''
+        return f'{token_id(token)}:{url}?{query}'
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """Получить запись из памяти, затем с диска"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        if self._db is not None:
+            op, value = self._pending.get(key, (None, None))
+            if op == 'set':
+                entry = value
+            elif op != 'delete':
+                entry = await asyncio.get_running_loop().run_in_executor(self._executor, self._read, key)
+                if entry is not None and op == 'touch':
+                    entry.stored_at = value
+            if entry is not None:
+                self._remember(key, entry)
+                self.hits += 1
+                return entry
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        """Сохранить ответ (на диск - в фоне)"""
+        self._remember(key, entry)
+        if self._db is not None:
+            self._queue(key, 'set', entry)
+
+    def touch(self, key: str) -> None:
+        """Ответ не изменился (304) - обновить время проверки"""
+        self.not_modified += 1
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            entry.stored_at = now
+        if self._db is not None:
+            op, value = self._pending.get(key, (None, None))
+            if op == 'set':
+                value.stored_at = now
+            elif op != 'delete':
+                self._queue(key, 'touch', now)
+
+    def invalidate(self, key: str) -> None:
+        """Удалить запись (после изменения данных через API)"""
+        self._memory.pop(key, None)
+        if self._db is not None:
+            self._queue(key, 'delete', None)
+
+    def _queue(self, key: str, op: str, value: Any) -> None:
+        self._pending[key] = (op, value)
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._delayed_write())
+
+    async def _delayed_write(self) -> None:
+        await asyncio.sleep(WRITE_DELAY)
+        await self._write_pending()
+
+    async def _write_pending(self) -> None:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, pending)
+        except Exception as e:
+            # кэш не критичен: записи остаются в памяти, на диск попадут при следующем ответе
+            print(f"❌ Ошибка записи кэша GitHub на диск: {e}")
+
+    # --- работа с диском (в потоке executor) ------------------------------------
+
+    def _read(self, key: str) -> Optional[CachedResponse]:
+        row = self._db.execute(
+            'SELECT body, etag, last_modified, stored_at, link FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        if not row:
+            return None
+        return CachedResponse(json.loads(row[0]), row[1], row[2], row[3], row[4])
+
+    def _write(self, pending: Dict[str, Tuple[str, Any]]) -> None:
+        with self._db:
+            self._db.execute('BEGIN')
+            for key, (op, value) in pending.items():
+                if op == 'set':
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO responses '
+                        '(key, body, etag, last_modified, stored_at, link) VALUES (?, ?, ?, ?, ?, ?)',
+                        (key, json.dumps(value.body), value.etag, value.last_modified,
+                         value.stored_at, value.link)
+                    )
+                    self._writes += 1
+                elif op == 'touch':
+                    self._db.execute('UPDATE responses SET stored_at = ? WHERE key = ?', (value, key))
+                else:
+                    self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+        if self._writes >= 1000:
+            self._writes = 0
+            self._prune_disk()
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _prune_disk(self) -> None:
+        self._db.execute(
+            'DELETE FROM responses WHERE key NOT IN '
+            '(SELECT key FROM responses ORDER BY stored_at DESC LIMIT ?)',
+            (self.max_disk_entries,)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Счётчики кэша"""
+        return {
+            'size': len(self._memory),
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified
+        }
+
+    async def close(self) -> None:
+        """Дописать отложенные изменения на диск и закрыть базу"""
+        if self._db is None:
+            return
+        if self._write_task is not None and not self._write_task.done():
+            self._write_task.cancel()
+            try:
+                await self._write_task
+            except asyncio.CancelledError:
+                pass
+        await self._write_pending()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._db.close)
+        self._db = None
+        self._executor.shutdown()
@@ -1,110 +1,537 @@
-
-import requests
+import asyncio
 import base64
-from typing import Optional, List, Dict, Any
+import importlib.util
+import re
+import time
+from typing import Optional, List, Dict, Any, Set, AsyncIterator, BinaryIO
+
+import httpx
+
 from config import config
+from services.github_cache import ResponseCache, CachedResponse, token_id
+from services.repo_tree import RepoTree
+from services.path_index import PathIndex
+from services.cache import TTLCache
+from services.rate_limiter import RateLimiter, RateBudget, RateLimitExceeded
+from services.single_flight import SingleFlight
+from services.metrics import GITHUB_LATENCY, GITHUB_RESPONSES, GITHUB_ERRORS
 
 class GitHubService:
     """Работа с GitHub API"""
-    
+
     def __init__(self):
         self.api_url = config.GITHUB_API_URL
-    
+        self._client: Optional[httpx.AsyncClient] = None
+        self.cache = ResponseCache(
+            config.GITHUB_CACHE_SIZE,
+            db_path=config.GITHUB_CACHE_DB_PATH or None
+        )
+        # (token_id, repo) -> RepoTree последнего открытого коммита
+        self.trees = TTLCache(config.REPO_TREE_CACHE_SIZE, config.REPO_TREE_TTL)
+        # (repo, commit_sha, path) -> отсортированный листинг папки (страницы режутся из него)
+        self.listings = TTLCache(config.DIR_LISTING_CACHE_SIZE, config.REPO_TREE_TTL)
+        # (repo, commit_sha) -> PathIndex для /find
+        self.path_indexes = TTLCache(config.PATH_INDEX_CACHE_SIZE, config.PATH_INDEX_TTL)
+        self.rate_limiter = RateLimiter(
+            reserve=config.GITHUB_RATE_RESERVE,
+            slowdown_threshold=config.GITHUB_RATE_SLOWDOWN,
+            max_delay=config.GITHUB_RATE_MAX_DELAY,
+            max_interactive_wait=config.GITHUB_RATE_MAX_WAIT
+        )
+        # одинаковые одновременные GET уходят в GitHub один раз
+        self.single_flight = SingleFlight()
+        # ключи, которые сейчас перепроверяются в фоне (stale-while-revalidate)
+        self._revalidating: Set[str] = set()
+        self._background_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Общий HTTP клиент с keep-alive пулом (создаётся при первом обращении)"""
+        if self._client is None or self._client.is_closed:
+            # HTTP/2 включаем только если установлен пакет h2
+            http2 = config.GITHUB_HTTP2 and importlib.util.find_spec('h2') is not None
+            self._client = httpx.AsyncClient(
+                base_url=self.api_url,
+                http2=http2,
+                timeout=httpx.Timeout(config.GITHUB_TIMEOUT, connect=config.GITHUB_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=config.GITHUB_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.GITHUB_MAX_KEEPALIVE,
+                    keepalive_expiry=config.GITHUB_KEEPALIVE_EXPIRY
+                )
+            )
+        return self._client
+
+    async def close(self) -> None:
+        """Закрыть пул соединений"""
+        for task in list(self._background_tasks):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        await self.cache.close()
+
     def _get_headers(self, token: str) -> Dict[str, str]:
         """Получить заголовки для запроса"""
         return {
             'Authorization': f'token {token}',
             'Accept': 'application/vnd.github.v3+json'
         }
-    
-    def validate_token(self, token: str) -> bool:
+
+    async def _request(self, method: str, token: str, url: str,
+                       background: bool = False, stream: bool = False, **kwargs) -> httpx.Response:
+        """Выполнить запрос к GitHub API через общий пул с учётом лимитов токена.
+        background=True - запрос не от пользователя, уступает интерактивным;
+        stream=True - тело не читается, ответ нужно закрыть (aclose)"""
+        key = token_id(token)
+        endpoint = _endpoint(url)
+        try:
+            await self.rate_limiter.acquire(key, background)
+        except RateLimitExceeded:
+            GITHUB_ERRORS.inc(endpoint, 'rate_limited')
+            raise
+        headers = self._get_headers(token)
+        headers.update(kwargs.pop('headers', None) or {})
+        started = time.perf_counter()
+        try:
+            request = self.client.build_request(method, url, headers=headers, **kwargs)
+            response = await self.client.send(request, stream=stream)
+        except httpx.TimeoutException:
+            GITHUB_ERRORS.inc(endpoint, 'timeout')
+            raise
+        except httpx.HTTPError:
+            GITHUB_ERRORS.inc(endpoint, 'transport')
+            raise
+        finally:
+            GITHUB_LATENCY.observe(endpoint, method, value=time.perf_counter() - started)
+        GITHUB_RESPONSES.inc(endpoint, str(response.status_code))
+        self.rate_limiter.update(key, response)
+        return response
+
+    def get_rate_budget(self, token: str) -> Optional[RateBudget]:
+        """Последний известный остаток лимита токена"""
+        return self.rate_limiter.budget(token_id(token))
+
+    def retry_after(self, token: str) -> float:
+        """Через сколько секунд токен снова сможет делать запросы (0 - уже может)"""
+        budget = self.get_rate_budget(token)
+        return budget.retry_after() if budget is not None else 0.0
+
+    async def _get_json(self, token: str, url: str, params: Optional[Dict[str, Any]] = None,
+                        revalidate: bool = False, background: bool = False) -> Optional[Any]:
+        """GET с кэшем: свежий ответ из памяти, устаревший - с фоновой перепроверкой,
+        иначе условный запрос (304 не расходует лимит GitHub).
+        revalidate=True - всегда условный запрос (для данных, которые должны быть актуальны)"""
+        entry = await self._get_cached(token, url, params, revalidate, background)
+        return entry.body if entry is not None else None
+
+    async def _get_cached(self, token: str, url: str, params: Optional[Dict[str, Any]] = None,
+                          revalidate: bool = False, background: bool = False) -> Optional[CachedResponse]:
+        """То же, что _get_json, но вместе с заголовками ответа"""
+        key = self.cache.make_key(token, url, params)
+        entry = await self.cache.get(key)
+        if entry is not None and not revalidate:
+            age = entry.age()
+            if age < config.GITHUB_CACHE_FRESH_TTL:
+                return entry
+            if age < config.GITHUB_CACHE_FRESH_TTL + config.GITHUB_CACHE_STALE_TTL:
+                if key not in self._revalidating:
+                    self._revalidating.add(key)
+                    task = asyncio.create_task(self._revalidate(key, token, url, params, entry))
+                    self._background_tasks.add(task)
+                    task.add_done_callback(self._background_tasks.discard)
+                return entry
+        return await self._fetch_json(key, token, url, params, entry, background)
+
+    async def _fetch_json(self, key: str, token: str, url: str,
+                          params: Optional[Dict[str, Any]], entry: Optional[CachedResponse],
+                          background: bool = False) -> Optional[CachedResponse]:
+        """Условный GET с обновлением кэша (одинаковые одновременные запросы объединяются).
+        Фоновые и интерактивные запросы не объединяются между собой: иначе запрос
+        пользователя унаследовал бы задержку или отказ, положенные фоновому"""
+        return await self.single_flight.do(
+            ('GET', key, background),
+            lambda: self._do_fetch_json(key, token, url, params, entry, background)
+        )
+
+    async def _do_fetch_json(self, key: str, token: str, url: str,
+                             params: Optional[Dict[str, Any]], entry: Optional[CachedResponse],
+                             background: bool) -> Optional[CachedResponse]:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        response = await self._request('GET', token, url, background=background, params=params, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(key)
+            return entry
+        if response.status_code == 200:
+            fresh = CachedResponse(
+                body=response.json(),
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+                stored_at=time.time(),
+                link=response.headers.get('Link')
+            )
+            if fresh.etag or fresh.last_modified:
+                self.cache.set(key, fresh)
+            return fresh
+        return None
+
+    async def _revalidate(self, key: str, token: str, url: str,
+                          params: Optional[Dict[str, Any]], entry: CachedResponse) -> None:
+        try:
+            await self._fetch_json(key, token, url, params, entry, background=True)
+        except Exception as e:
+            print(f"❌ Ошибка фоновой проверки кэша: {e}")
+        finally:
+            self._revalidating.discard(key)
+
+    def _contents_url(self, repo_full_name: str, path: str = '') -> str:
+        return f'/repos/{repo_full_name}/contents/{path}'
+
+    def _invalidate_parent(self, token: str, repo_full_name: str, path: str) -> None:
+        """Сбросить кэш папки, в которой изменился файл"""
+        parent = path.rsplit('/', 1)[0] if '/' in path else ''
+        self.cache.invalidate(self.cache.make_key(token, self._contents_url(repo_full_name, parent)))
+        self.trees.pop((token_id(token), repo_full_name))
+
+    async def validate_token(self, token: str) -> bool:
         """Проверить валидность токена"""
         try:
-            headers = self._get_headers(token)
-            response = requests.get(f'{self.api_url}/user', headers=headers, timeout=10)
+            response = await self._request('GET', token, '/user')
             return response.status_code == 200
         except Exception as e:
             print(f"❌ Ошибка валидации токена: {e}")
             return False
-    
-    def get_user_info(self, token: str) -> Optional[Dict[str, Any]]:
+
+    async def get_user_info(self, token: str) -> Optional[Dict[str, Any]]:
         """Получить информацию о пользователе GitHub"""
         try:
-            headers = self._get_headers(token)
-            response = requests.get(f'{self.api_url}/user', headers=headers, timeout=10)
+            response = await self._request('GET', token, '/user')
             if response.status_code == 200:
                 return response.json()
             return None
         except Exception as e:
             print(f"❌ Ошибка получения инфо пользователя: {e}")
             return None
-    
-    def get_repositories(self, token: str) -> Optional[List[Dict[str, Any]]]:
-        """Получить список репозиториев"""
+
+    async def get_repositories(self, token: str) -> Optional[List[Dict[str, Any]]]:
+        """Получить список всех репозиториев (все страницы)"""
         try:
-            headers = self._get_headers(token)
-            response = requests.get(
-                f'{self.api_url}/user/repos',
-                headers=headers,
-                params={'per_page': 100, 'sort': 'updated'},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            return None
+            repos = []
+            async for page in self.iter_repository_pages(token):
+                repos.extend(page)
+            return repos
         except Exception as e:
             print(f"❌ Ошибка получения репозиториев: {e}")
             return None
-    
-    def get_contents(self, token: str, repo_full_name: str, path: str = '') -> Optional[Any]:
+
+    async def iter_repository_pages(self, token: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Страницы репозиториев по порядку. После первой страницы номер последней
+        известен из заголовка Link, и остальные страницы запрашиваются параллельно"""
+        params = {'per_page': 100, 'sort': 'updated'}
+        first = await self._get_cached(token, '/user/repos', params={**params, 'page': 1})
+        if first is None:
+            raise RuntimeError('не удалось получить первую страницу репозиториев')
+        yield first.body
+
+        last_page = _last_page(first.link)
+        if last_page <= 1:
+            return
+
+        semaphore = asyncio.Semaphore(config.GITHUB_PAGE_CONCURRENCY)
+
+        async def fetch(page: int) -> Optional[List[Dict[str, Any]]]:
+            async with semaphore:
+                return await self._get_json(token, '/user/repos', params={**params, 'page': page})
+
+        tasks = [asyncio.create_task(fetch(page)) for page in range(2, last_page + 1)]
+        try:
+            for page, task in enumerate(tasks, start=2):
+                body = await task
+                if body is None:
+                    raise RuntimeError(f'не удалось получить страницу {page} репозиториев')
+                yield body
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_contents(self, token: str, repo_full_name: str, path: str = '') -> Optional[Any]:
         """Получить содержимое репозитория/папки"""
         try:
-            headers = self._get_headers(token)
-            url = f'{self.api_url}/repos/{repo_full_name}/contents/{path}'
-            response = requests.get(url, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return await self._get_json(token, self._contents_url(repo_full_name, path))
         except Exception as e:
             print(f"❌ Ошибка получения содержимого: {e}")
             return None
-    
-    def create_file(self, token: str, repo_full_name: str, path: str, 
+
+    async def get_repo_events(self, token: str, repo_full_name: str) -> Optional[List[Dict[str, Any]]]:
+        """Последние события репозитория, новые первыми (фоновый условный запрос:
+        если ничего не изменилось, GitHub отвечает 304 и лимит не расходуется)"""
+        try:
+            return await self._get_json(
+                token, f'/repos/{repo_full_name}/events', params={'per_page': 30},
+                revalidate=True, background=True
+            )
+        except Exception as e:
+            print(f"❌ Ошибка получения событий {repo_full_name}: {e}")
+            return None
+
+    async def can_read_repo(self, token: str, repo_full_name: str,
+                            background: bool = False) -> Optional[bool]:
+        """Видит ли токен репозиторий (None - проверить не удалось: сеть, лимит, ошибка GitHub)"""
+        try:
+            response = await self._request('GET', token, f'/repos/{repo_full_name}', background=background)
+        except Exception as e:
+            print(f"❌ Ошибка проверки доступа к {repo_full_name}: {e}")
+            return None
+        if response.status_code == 200:
+            return True
+        if response.status_code == 403 and response.headers.get('x-ratelimit-remaining') == '0':
+            return None
+        if response.status_code in (401, 403, 404):
+            return False
+        return None
+
+    async def get_head_sha(self, token: str, repo_full_name: str) -> Optional[str]:
+        """SHA последнего коммита ветки по умолчанию"""
+        repo = await self._get_json(token, f'/repos/{repo_full_name}')
+        if not repo:
+            return None
+        # ссылку всегда перепроверяем: 304 бесплатен, а сдвиг ветки надо заметить сразу
+        ref = await self._get_json(
+            token, f'/repos/{repo_full_name}/git/ref/heads/{repo["default_branch"]}', revalidate=True
+        )
+        if not ref:
+            return None
+        return ref['object']['sha']
+
+    async def load_tree(self, token: str, repo_full_name: str) -> Optional[RepoTree]:
+        """Загрузить всё дерево репозитория одним запросом (один раз на коммит)"""
+        try:
+            sha = await self.get_head_sha(token, repo_full_name)
+            if sha is None:
+                return None
+
+            key = (token_id(token), repo_full_name)
+            tree = self.trees.get(key)
+            if tree is not None and tree.commit_sha == sha:
+                return tree
+
+            tree = await self.single_flight.do(
+                ('tree', key, sha), lambda: self._fetch_tree(token, repo_full_name, sha)
+            )
+            if tree is None:
+                self.trees.pop(key)
+                return None
+            self.trees.set(key, tree)
+            return tree
+        except Exception as e:
+            print(f"❌ Ошибка загрузки дерева репозитория: {e}")
+            return None
+
+    async def _fetch_tree(self, token: str, repo_full_name: str, sha: str) -> Optional[RepoTree]:
+        # Дерево по SHA неизменно - в кэш ответов его не кладём, индекс компактнее
+        response = await self._request(
+            'GET', token, f'/repos/{repo_full_name}/git/trees/{sha}', params={'recursive': '1'}
+        )
+        if response.status_code != 200:
+            return None
+        return RepoTree.from_git_tree(sha, response.json())
+
+    async def load_path_index(self, token: str, repo_full_name: str) -> Optional[PathIndex]:
+        """Индекс путей файлов для поиска (строится один раз на коммит, в отдельном потоке)"""
+        tree = await self.load_tree(token, repo_full_name)
+        if tree is None:
+            return None
+        key = (repo_full_name, tree.commit_sha)
+        index = self.path_indexes.get(key)
+        if index is None:
+            loop = asyncio.get_running_loop()
+            index = await self.single_flight.do(('path_index',) + key, lambda: loop.run_in_executor(
+                None, PathIndex, tree.commit_sha, tree.truncated, tree.iter_files()
+            ))
+            self.path_indexes.set(key, index)
+        return index
+
+    async def list_directory(self, token: str, repo_full_name: str, path: str = '') -> Optional[List[Dict[str, Any]]]:
+        """Содержимое папки, папки первыми и по имени: из кэша листингов, загруженного
+        дерева, иначе запросом к Contents API"""
+        tree = self.trees.get((token_id(token), repo_full_name))
+        key = (repo_full_name, tree.commit_sha, path) if tree is not None else None
+        if key is not None:
+            listing = self.listings.get(key)
+            if listing is not None:
+                return listing
+
+        listing = tree.list_dir(path) if tree is not None else None
+        if listing is None:
+            listing = await self.get_contents(token, repo_full_name, path)
+            if not isinstance(listing, list):
+                return listing
+        listing = sorted(listing, key=lambda item: (item['type'] != 'dir', item['name'].casefold()))
+        if key is not None:
+            self.listings.set(key, listing)
+        return listing
+
+    async def download_file(self, token: str, repo_full_name: str, path: str,
+                            target: BinaryIO, max_bytes: int) -> Optional[int]:
+        """Скачать файл потоком в target (без копии в памяти).
+        Возвращает число байт или None (ошибка или файл больше max_bytes)"""
+        try:
+            response = await self._request(
+                'GET', token, self._contents_url(repo_full_name, path), stream=True,
+                headers={'Accept': 'application/vnd.github.raw'}
+            )
+            try:
+                if response.status_code != 200:
+                    return None
+                length = response.headers.get('Content-Length')
+                if length is not None and int(length) > max_bytes:
+                    return None
+
+                written = 0
+                async for chunk in response.aiter_bytes(config.FILE_DOWNLOAD_CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > max_bytes:
+                        return None
+                    target.write(chunk)
+                return written
+            finally:
+                await response.aclose()
+        except Exception as e:
+            print(f"❌ Ошибка скачивания файла: {e}")
+            return None
+
+    async def commit_changes(self, token: str, repo_full_name: str,
+                             changes: Dict[str, Optional[str]], message: str) -> Optional[str]:
+        """Изменить несколько файлов одним коммитом через Git Data API.
+        changes: путь -> новое содержимое (None - удалить файл).
+        Возвращает sha коммита или None. Число запросов не зависит от числа файлов"""
+        try:
+            repo = await self._get_json(token, f'/repos/{repo_full_name}')
+            if not repo:
+                return None
+            git_url = f'/repos/{repo_full_name}/git'
+            branch = repo['default_branch']
+            # содержимое передаётся прямо в дереве - отдельные blob-запросы не нужны
+            entries = [
+                {'path': path, 'mode': '100644', 'type': 'blob', 'sha': None}
+                if content is None else
+                {'path': path, 'mode': '100644', 'type': 'blob', 'content': content}
+                for path, content in changes.items()
+            ]
+
+            for _ in range(config.GITHUB_COMMIT_RETRIES):
+                response = await self._request('GET', token, f'{git_url}/ref/heads/{branch}')
+                if response.status_code != 200:
+                    return None
+                head_sha = response.json()['object']['sha']
+
+                response = await self._request('GET', token, f'{git_url}/commits/{head_sha}')
+                if response.status_code != 200:
+                    return None
+                base_tree = response.json()['tree']['sha']
+
+                response = await self._request('POST', token, f'{git_url}/trees', json={
+                    'base_tree': base_tree, 'tree': entries
+                })
+                if response.status_code != 201:
+                    # например, удаляемого файла уже нет
+                    return None
+                tree_sha = response.json()['sha']
+
+                response = await self._request('POST', token, f'{git_url}/commits', json={
+                    'message': message, 'tree': tree_sha, 'parents': [head_sha]
+                })
+                if response.status_code != 201:
+                    return None
+                commit_sha = response.json()['sha']
+
+                # только fast-forward: если ветку сдвинули, собираем коммит заново поверх новой головы
+                response = await self._request('PATCH', token, f'{git_url}/refs/heads/{branch}', json={
+                    'sha': commit_sha, 'force': False
+                })
+                if response.status_code == 200:
+                    for path in changes:
+                        self._invalidate_parent(token, repo_full_name, path)
+                    return commit_sha
+                if response.status_code != 422:
+                    return None
+            return None
+        except Exception as e:
+            print(f"❌ Ошибка коммита изменений: {e}")
+            return None
+
+    async def delete_files(self, token: str, repo_full_name: str,
+                           paths: List[str], message: str) -> bool:
+        """Удалить несколько файлов одним коммитом"""
+        return await self.commit_changes(token, repo_full_name, dict.fromkeys(paths), message) is not None
+
+    async def create_file(self, token: str, repo_full_name: str, path: str,
                    content: str, message: str) -> bool:
         """Создать файл в репозитории"""
         try:
-            headers = self._get_headers(token)
-            url = f'{self.api_url}/repos/{repo_full_name}/contents/{path}'
-            
+            url = self._contents_url(repo_full_name, path)
+
             encoded_content = base64.b64encode(content.encode()).decode()
-            
+
             data = {
                 'message': message,
                 'content': encoded_content
             }
-            
-            response = requests.put(url, headers=headers, json=data, timeout=10)
-            return response.status_code == 201
+
+            response = await self._request('PUT', token, url, json=data)
+            if response.status_code == 201:
+                self._invalidate_parent(token, repo_full_name, path)
+                return True
+            return False
         except Exception as e:
             print(f"❌ Ошибка создания файла: {e}")
             return False
-    
-    def delete_file(self, token: str, repo_full_name: str, path: str, 
+
+    async def delete_file(self, token: str, repo_full_name: str, path: str,
                    sha: str, message: str) -> bool:
         """Удалить файл из репозитория"""
         try:
-            headers = self._get_headers(token)
-            url = f'{self.api_url}/repos/{repo_full_name}/contents/{path}'
-            
+            url = self._contents_url(repo_full_name, path)
+
             data = {
                 'message': message,
                 'sha': sha
             }
-            
-            response = requests.delete(url, headers=headers, json=data, timeout=10)
-            return response.status_code == 200
+
+            # httpx.delete() не принимает тело, поэтому используем request()
+            response = await self._request('DELETE', token, url, json=data)
+            if response.status_code == 200:
+                self._invalidate_parent(token, repo_full_name, path)
+                return True
+            return False
         except Exception as e:
             print(f"❌ Ошибка удаления файла: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+def _endpoint(url: str) -> str:
+    """Шаблон пути для метрик: без владельца, репозитория, sha и пути к файлу"""
+    path = httpx.URL(url).path.strip('/').split('/')
+    if path[0] == 'repos' and len(path) > 3:
+        if path[3] == 'git' and len(path) > 4:
+            return f'/repos/:repo/git/{path[4]}'
+        return f'/repos/:repo/{path[3]}'
+    if path[0] == 'repos':
+        return '/repos/:repo'
+    return '/' + '/'.join(path)
+
+
+def _last_page(link: Optional[str]) -> int:
+    """Номер последней страницы из заголовка Link (1, если страница одна)"""
+    if link:
+        match = re.search(r'[?&]page=(\d+)[^>]*>;\s*rel="last"', link)
+        if match:
+            return int(match.group(1))
+    return 1
@@ -0,0 +1,201 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    """Монотонный счётчик с метками"""
+
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Увеличить счётчик (значения меток - в порядке labelnames)"""
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (формат Prometheus)"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # метки -> [счётчики по корзинам (+Inf последняя), сумма]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        """Добавить наблюдение: поиск корзины и два сложения"""
+        item = self._values.get(labels)
+        if item is None:
+            item = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        item[0][bisect_left(self.buckets, value)] += 1
+        item[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket = _format_labels(self.labelnames, labels, 'le="%s"' % bound)
+                yield f'{self.name}_bucket{bucket} {cumulative}'
+            cumulative += counts[-1]
+            bucket = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            yield f'{self.name}_bucket{bucket} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}'
+
+
+class MetricsRegistry:
+    """Набор метрик процесса и вывод в текстовом формате Prometheus.
+
+    Запись метрики - операции со словарём в event loop, без блокировок и
+    без внешних зависимостей. Значения, которые и так считаются в сервисах
+    (размеры и попадания кэшей), не дублируются: их собирают функции-сборщики
+    в момент запроса /metrics.
+    """
+
+    def __init__(self):
+        self._metrics: List[Union[Counter, Histogram]] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]) -> None:
+        """Функция, возвращающая (имя, метки, значение) в момент выгрузки"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus 0.0.4"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    names = tuple(labels)
+                    lines.append(f'{name}{_format_labels(names, tuple(labels[n] for n in names))} {value}')
+            except Exception as e:
+                print(f"❌ Ошибка сбора метрик: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+HANDLER_LATENCY = metrics.histogram(
+    'bot_handler_seconds', 'Время обработки обновления', ('handler',))
+HANDLER_ERRORS = metrics.counter(
+    'bot_handler_errors_total', 'Необработанные исключения в обработчиках', ('handler',))
+GITHUB_LATENCY = metrics.histogram(
+    'github_request_seconds', 'Время запроса к GitHub API', ('endpoint', 'method'))
+GITHUB_RESPONSES = metrics.counter(
+    'github_responses_total', 'Ответы GitHub API по статусу', ('endpoint', 'status'))
+GITHUB_ERRORS = metrics.counter(
+    'github_errors_total', 'Запросы к GitHub без ответа (сеть, таймаут, лимит)', ('endpoint', 'reason'))
+SUPABASE_LATENCY = metrics.histogram(
+    'supabase_request_seconds', 'Время запроса к Supabase', ('table', 'operation'))
+SUPABASE_ERRORS = metrics.counter(
+    'supabase_errors_total', 'Ошибки запросов к Supabase', ('table', 'operation'))
+LOOP_LAG = metrics.histogram(
+    'event_loop_lag_seconds', 'Опоздание event loop относительно таймера',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+
+
+def timed_handler(name: Union[str, Callable[[Any], str]]):
+    """Декоратор обработчика: время и исключения в bot_handler_*.
+    name - строка или функция от Update (например, префикс callback_data)"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, update, context, *args, **kwargs):
+            label = name if isinstance(name, str) else name(update)
+            started = time.perf_counter()
+            try:
+                return await fn(self, update, context, *args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(label)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(label, value=time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def cache_collector(name: str, stats: Callable[[], Dict[str, int]]) -> Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]:
+    """Сборщик для кэша со stats() вида {'size', 'hits', 'misses'}"""
+    def collect():
+        values = stats()
+        labels = {'cache': name}
+        for key, metric in (('hits', 'cache_hits_total'), ('misses', 'cache_misses_total'), ('size', 'cache_size')):
+            if key in values:
+                yield metric, labels, values[key]
+    return collect
+
+
+class LoopLagMonitor:
+    """Периодически засыпает на interval и меряет, насколько позже проснулся"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            LOOP_LAG.observe(value=max(0.0, loop.time() - started - self.interval))
+
+    def start(self) -> None:
+        """Запустить замер (внутри работающего event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить замер"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
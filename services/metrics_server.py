@@ -0,0 +1,35 @@
+from typing import Optional
+from aiohttp import web
+from services.metrics import metrics
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """GET /metrics в текстовом формате Prometheus"""
+    return web.Response(body=metrics.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+
+class MetricsServer:
+    """Отдельный HTTP сервер для /metrics (в режиме polling своего сервера у бота нет)"""
+
+    def __init__(self, listen: str, port: int, path: str):
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.web_app = web.Application()
+        self.web_app.router.add_get(path, handle_metrics)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        """Запустить HTTP сервер"""
+        self._runner = web.AppRunner(self.web_app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        print(f"📈 Метрики: http://{self.listen}:{self.port}{self.path}")
+
+    async def stop(self) -> None:
+        """Остановить HTTP сервер"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,117 @@
+import heapq
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+MIN_QUERY_LENGTH = 3
+# доля триграмм запроса, которая должна совпасть при поиске с опечатками
+FUZZY_MIN_SHARE = 0.6
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PathIndex:
+    """Триграммный индекс путей файлов одного коммита (для /find).
+
+    Триграммы пути делятся на две части: путь папки индексируется один раз
+    на папку, а у файла - только хвост "<2 последние буквы папки>/<имя>".
+    Вместе они дают все триграммы полного пути, но индекс строится в разы
+    быстрее и занимает меньше памяти: в репозитории папок обычно намного
+    меньше, чем файлов. Запрос начинается с самой редкой триграммы и
+    проверяется подстрокой, так что все пути не перебираются.
+    """
+
+    def __init__(self, commit_sha: str, truncated: bool, files: Iterable[Tuple[str, str, int]]):
+        self.commit_sha = commit_sha
+        # дерево было обрезано GitHub - часть файлов в индекс не попала
+        self.truncated = truncated
+        # порядок номеров файлов = порядок выдачи при равном совпадении:
+        # сначала менее вложенные и более короткие пути
+        self._files: List[Tuple[str, str, int]] = sorted(
+            files, key=lambda file: (file[0].count('/'), len(file[0]), file[0])
+        )
+        self._lower: List[str] = []
+        self._names: List[str] = []
+
+        dir_ids: Dict[str, int] = {}
+        dir_files: List[List[int]] = []
+        file_postings: Dict[str, List[int]] = {}
+        for file_id, (path, _, _) in enumerate(self._files):
+            path = path.lower()
+            self._lower.append(path)
+            parent, slash, name = path.rpartition('/')
+            self._names.append(name)
+            dir_id = dir_ids.setdefault(parent, len(dir_files))
+            if dir_id == len(dir_files):
+                dir_files.append([])
+            dir_files[dir_id].append(file_id)
+            for gram in _trigrams(parent[-2:] + slash + name):
+                file_postings.setdefault(gram, []).append(file_id)
+
+        dir_postings: Dict[str, List[int]] = {}
+        # сколько файлов лежит в папках с этой триграммой (для выбора самой редкой)
+        self._dir_weight: Counter = Counter()
+        for parent, dir_id in dir_ids.items():
+            for gram in _trigrams(parent):
+                dir_postings.setdefault(gram, []).append(dir_id)
+                self._dir_weight[gram] += len(dir_files[dir_id])
+
+        self._file_postings = {gram: array('I', ids) for gram, ids in file_postings.items()}
+        self._dir_postings = {gram: array('I', ids) for gram, ids in dir_postings.items()}
+        self._dir_files = [array('I', ids) for ids in dir_files]
+
+    def _weight(self, gram: str) -> int:
+        return len(self._file_postings.get(gram, ())) + self._dir_weight.get(gram, 0)
+
+    def _with_gram(self, gram: str) -> Set[int]:
+        """Файлы, в полном пути которых есть триграмма"""
+        file_ids = set(self._file_postings.get(gram, ()))
+        for dir_id in self._dir_postings.get(gram, ()):
+            file_ids.update(self._dir_files[dir_id])
+        return file_ids
+
+    def _rank(self, file_id: int, terms: List[str]) -> Tuple[int, int]:
+        """Чем меньше, тем выше: совпадение в имени файла, затем глубина и длина пути"""
+        name = self._names[file_id]
+        if name == ' '.join(terms):
+            return 0, file_id
+        if name.startswith(terms[-1]):
+            return 1, file_id
+        if all(term in name for term in terms):
+            return 2, file_id
+        if any(term in name for term in terms):
+            return 3, file_id
+        return 4, file_id
+
+    def _fuzzy(self, grams: Set[str], terms: List[str], limit: int) -> List[int]:
+        """Файлы, в имени которых есть большая часть триграмм запроса (опечатки, пропущенные буквы)"""
+        hits: Counter = Counter()
+        for gram in grams:
+            hits.update(self._file_postings.get(gram, ()))
+        need = max(2, int(len(grams) * FUZZY_MIN_SHARE + 0.999))
+        matches = [file_id for file_id, count in hits.items() if count >= need]
+        return heapq.nsmallest(limit, matches, key=lambda file_id: (-hits[file_id], self._rank(file_id, terms)))
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, str, int]]:
+        """Файлы, в пути которых есть все слова запроса: [(path, sha, size)], лучшие первыми.
+        Хотя бы одно слово должно быть не короче MIN_QUERY_LENGTH букв"""
+        terms = query.lower().split()
+        grams = set().union(*(_trigrams(term) for term in terms))
+        # без слова из трёх букв пришлось бы перебирать все пути
+        if not grams:
+            return []
+        candidates = self._with_gram(min(grams, key=self._weight))
+        matches = [file_id for file_id in candidates
+                   if all(term in self._lower[file_id] for term in terms)]
+        if matches:
+            best = heapq.nsmallest(limit, matches, key=lambda file_id: self._rank(file_id, terms))
+        elif len(grams) >= 2:
+            best = self._fuzzy(grams, terms, limit)
+        else:
+            best = []
+        return [self._files[file_id] for file_id in best]
+
+    def __len__(self) -> int:
+        return len(self._files)
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import sqlite3
+from abc import abstractmethod
+from typing import Optional, Dict, Any, Tuple
+from telegram.ext import BasePersistence, PersistenceInput
+from services.supabase_service import SupabaseService
+
+# PTB передаёт изменения пачкой раз в update_interval; запись идёт чуть позже,
+# чтобы вся пачка попала в один пакет
+FLUSH_DELAY = 0.5
+
+
+class BufferedPersistence(BasePersistence):
+    """Общая часть хранилищ состояния диалогов ConversationHandler.
+
+    Хранилище нужно, чтобы состояние диалогов переживало перезапуск бота.
+    Общим состоянием для нескольких одновременно работающих экземпляров оно
+    не является: PTB читает диалоги только при старте, и изменения одного
+    экземпляра другие не видят. user_data, chat_data, bot_data и
+    callback_data не храним - обработчики их не используют.
+
+    PTB раз в update_interval секунд передаёт изменения в update_conversation(),
+    но сам flush() вызывает только при остановке. Поэтому изменения копятся в
+    памяти (повторные изменения одного ключа схлопываются), и первое из них
+    запускает фоновую запись всего буфера одним пакетом через FLUSH_DELAY
+    секунд - при падении теряется не больше одного интервала. Если запись не
+    удалась, буфер остаётся и запись повторяется через update_interval.
+    """
+
+    def __init__(self, update_interval: float):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=False, callback_data=False),
+            update_interval=update_interval
+        )
+        self._pending_conversations: Dict[Tuple[str, str], Optional[object]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # --- чтение -------------------------------------------------------------
+
+    async def get_conversations(self, name: str) -> Dict[Tuple[int, ...], object]:
+        states = await self._load_conversations(name)
+        return {tuple(json.loads(key)): state for key, state in states.items()}
+
+    # --- запись (буфер) -----------------------------------------------------
+
+    async def update_conversation(self, name: str, key: Tuple[int, ...],
+                                  new_state: Optional[object]) -> None:
+        self._pending_conversations[(name, json.dumps(list(key)))] = new_state
+        self._schedule_flush()
+
+    def _schedule_flush(self, delay: float = FLUSH_DELAY) -> None:
+        """Запустить фоновую запись буфера, если она ещё не запланирована"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush(delay))
+
+    async def _delayed_flush(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if not await self._flush_pending():
+            # хранилище недоступно - повторить позже, буфер сохранён
+            self._flush_task = None
+            self._schedule_flush(self.update_interval)
+
+    async def flush(self) -> None:
+        """Вызывается PTB при остановке: дождаться фоновой записи и записать остаток"""
+        task = self._flush_task
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self._flush_pending()
+
+    async def _flush_pending(self) -> bool:
+        """Записать накопленные изменения одним пакетом (False - ошибка, буфер возвращён)"""
+        async with self._flush_lock:
+            conversations, self._pending_conversations = self._pending_conversations, {}
+            if not conversations:
+                return True
+            try:
+                await self._write(conversations)
+                return True
+            except asyncio.CancelledError:
+                # остановка во время записи - остаток запишет flush()
+                self._requeue(conversations)
+                raise
+            except Exception as e:
+                print(f"❌ Ошибка сохранения состояния бота: {e}")
+                self._requeue(conversations)
+                return False
+
+    async def forget_user(self, user_id: int) -> None:
+        """Удалить состояние диалогов пользователя: из буфера и из хранилища"""
+        async with self._flush_lock:
+            suffix = f', {user_id}]'
+            self._pending_conversations = {
+                (name, key): state for (name, key), state in self._pending_conversations.items()
+                if not key.endswith(suffix)
+            }
+            await self._delete_user(user_id)
+
+    def _requeue(self, conversations) -> None:
+        """Вернуть в буфер, не затирая более свежие изменения"""
+        self._pending_conversations = {**conversations, **self._pending_conversations}
+
+    # --- user_data, chat_data, bot_data и callback_data не храним -----------
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        pass
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def get_callback_data(self) -> Optional[Any]:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    # --- реализация хранилища -----------------------------------------------
+
+    @abstractmethod
+    async def _load_conversations(self, name: str) -> Dict[str, object]:
+        ...
+
+    @abstractmethod
+    async def _write(self, conversations: Dict[Tuple[str, str], Optional[object]]) -> None:
+        """None в значении - запись удаляется"""
+
+    @abstractmethod
+    async def _delete_user(self, user_id: int) -> None:
+        """Удалить все диалоги пользователя (ключ - JSON "[chat_id, user_id]")"""
+
+
+class SQLitePersistence(BufferedPersistence):
+    """Состояние диалогов в локальном файле SQLite"""
+
+    def __init__(self, path: str, update_interval: float):
+        super().__init__(update_interval)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS conversations ('
+            '  name TEXT NOT NULL, key TEXT NOT NULL, state TEXT NOT NULL, PRIMARY KEY (name, key))'
+        )
+
+    async def _load_conversations(self, name: str) -> Dict[str, object]:
+        rows = await asyncio.to_thread(
+            lambda: self._db.execute('SELECT key, state FROM conversations WHERE name = ?', (name,)).fetchall()
+        )
+        return {key: json.loads(state) for key, state in rows}
+
+    async def _write(self, conversations) -> None:
+        await asyncio.to_thread(self._write_sync, conversations)
+
+    async def _delete_user(self, user_id: int) -> None:
+        await asyncio.to_thread(
+            self._db.execute, 'DELETE FROM conversations WHERE key LIKE ?', (f'%, {user_id}]',)
+        )
+
+    def _write_sync(self, conversations) -> None:
+        with self._db:
+            self._db.execute('BEGIN')
+            self._db.executemany(
+                'INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)',
+                [(name, key, json.dumps(state)) for (name, key), state in conversations.items() if state is not None]
+            )
+            self._db.executemany(
+                'DELETE FROM conversations WHERE name = ? AND key = ?',
+                [(name, key) for (name, key), state in conversations.items() if state is None]
+            )
+
+
+class SupabasePersistence(BufferedPersistence):
+    """Состояние диалогов в таблице Supabase bot_conversations (migrations/002):
+    переживает перезапуск и переезд бота на другую машину"""
+
+    def __init__(self, db: SupabaseService, update_interval: float):
+        super().__init__(update_interval)
+        self.db = db
+
+    async def _load_conversations(self, name: str) -> Dict[str, object]:
+        response = await self.db._execute(
+            self.db.client.table('bot_conversations').select('key, state').eq('name', name)
+        )
+        return {row['key']: row['state'] for row in response.data or []}
+
+    async def _write(self, conversations) -> None:
+        client = self.db.client
+        queries = []
+
+        upserts = [
+            {'name': name, 'key': key, 'state': state}
+            for (name, key), state in conversations.items() if state is not None
+        ]
+        if upserts:
+            queries.append(client.table('bot_conversations').upsert(upserts, on_conflict='name,key'))
+        deletes: Dict[str, list] = {}
+        for (name, key), state in conversations.items():
+            if state is None:
+                deletes.setdefault(name, []).append(key)
+        for name, keys in deletes.items():
+            queries.append(client.table('bot_conversations').delete().eq('name', name).in_('key', keys))
+
+        await asyncio.gather(*(self.db._execute(query) for query in queries))
+
+    async def _delete_user(self, user_id: int) -> None:
+        # строки в bot_conversations удаляет SupabaseService.delete_user_data
+        pass
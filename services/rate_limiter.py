@@ -0,0 +1,118 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+import httpx
+from services.cache import TTLCache
+
+class RateLimitExceeded(Exception):
+    """Запрос не отправлен: лимит GitHub исчерпан"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"лимит GitHub API исчерпан, повтор через {retry_after:.0f} с")
+        self.retry_after = retry_after
+
+
+@dataclass
+class RateBudget:
+    """Остаток лимита одного токена по последнему ответу GitHub"""
+    limit: int = 5000
+    remaining: Optional[int] = None
+    reset_at: float = 0.0
+    # вторичный лимит / Retry-After: до этого момента запросы не отправляем
+    blocked_until: float = 0.0
+    # сколько раз подряд получили вторичный лимит без Retry-After
+    strikes: int = 0
+
+    def retry_after(self, now: Optional[float] = None) -> float:
+        """Через сколько секунд снова можно отправлять запросы (0 - можно сейчас)"""
+        now = time.time() if now is None else now
+        wait = max(0.0, self.blocked_until - now)
+        if self.remaining is not None and self.remaining <= 0 and self.reset_at > now:
+            wait = max(wait, self.reset_at - now)
+        return wait
+
+
+class RateLimiter:
+    """Учёт лимитов GitHub по токенам и планирование запросов.
+
+    Интерактивные запросы идут первыми: фоновым недоступны последние
+    `reserve` запросов, и при малом остатке они притормаживаются сильнее.
+    """
+
+    # вторичный лимит без Retry-After: 60 с, затем удваиваем
+    SECONDARY_BACKOFF = 60.0
+
+    def __init__(self, reserve: int, slowdown_threshold: int, max_delay: float,
+                 max_interactive_wait: float, max_tokens: int = 100000):
+        self.reserve = reserve
+        self.slowdown_threshold = slowdown_threshold
+        self.max_delay = max_delay
+        self.max_interactive_wait = max_interactive_wait
+        # лимиты GitHub сбрасываются раз в час - дольше хранить незачем
+        self._budgets = TTLCache(max_tokens, ttl=3600)
+
+    def budget(self, key: str) -> Optional[RateBudget]:
+        """Текущий бюджет токена (None - ещё не было ответов)"""
+        return self._budgets.get(key)
+
+    async def acquire(self, key: str, background: bool = False) -> None:
+        """Дождаться разрешения на запрос или выбросить RateLimitExceeded"""
+        budget = self._budgets.get(key)
+        if budget is None:
+            return
+        now = time.time()
+
+        wait = budget.retry_after(now)
+        if wait > 0:
+            if background or wait > self.max_interactive_wait:
+                raise RateLimitExceeded(wait)
+            await asyncio.sleep(wait)
+            return
+
+        if budget.remaining is None or budget.reset_at <= now:
+            return
+        if background and budget.remaining <= self.reserve:
+            raise RateLimitExceeded(budget.reset_at - now)
+        if budget.remaining < self.slowdown_threshold:
+            # растягиваем остаток на время до сброса
+            delay = (budget.reset_at - now) / max(budget.remaining, 1)
+            if not background:
+                delay /= 4
+            await asyncio.sleep(min(delay, self.max_delay))
+
+    def update(self, key: str, response: httpx.Response) -> None:
+        """Запомнить лимиты из заголовков ответа"""
+        headers = response.headers
+        budget = self._budgets.get(key) or RateBudget()
+        now = time.time()
+
+        if 'X-RateLimit-Remaining' in headers:
+            budget.remaining = int(headers['X-RateLimit-Remaining'])
+            budget.limit = int(headers.get('X-RateLimit-Limit', budget.limit))
+            budget.reset_at = float(headers.get('X-RateLimit-Reset', budget.reset_at))
+
+        if response.status_code in (403, 429):
+            retry_after = headers.get('Retry-After')
+            if retry_after is not None:
+                budget.blocked_until = now + float(retry_after)
+            elif budget.remaining == 0:
+                budget.blocked_until = budget.reset_at
+            elif _is_secondary_limit(response):
+                # вторичный лимит без подсказки - экспоненциальная пауза
+                budget.blocked_until = now + self.SECONDARY_BACKOFF * (2 ** budget.strikes)
+                budget.strikes = min(budget.strikes + 1, 5)
+        elif response.status_code < 400:
+            budget.strikes = 0
+
+        self._budgets.set(key, budget)
+
+
+def _is_secondary_limit(response: httpx.Response) -> bool:
+    """403 бывает и из-за прав доступа - отличаем по тексту ответа"""
+    if response.status_code == 429:
+        return True
+    try:
+        return 'rate limit' in response.text.lower()
+    except httpx.ResponseNotRead:
+        return False
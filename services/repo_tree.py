@@ -0,0 +1,48 @@
+from typing import Optional, List, Dict, Any, Tuple, Iterator
+
+# типы Git Trees API -> типы Contents API
+_TYPES = {'tree': 'dir', 'blob': 'file', 'commit': 'submodule'}
+
+class RepoTree:
+    """Дерево репозитория на конкретном коммите, сгруппированное по папкам"""
+
+    def __init__(self, commit_sha: str, truncated: bool,
+                 dirs: Dict[str, List[Tuple[str, str, str, int]]]):
+        self.commit_sha = commit_sha
+        # GitHub обрезает очень большие деревья - тогда папки грузятся по одной
+        self.truncated = truncated
+        # путь папки -> [(name, type, sha, size)]
+        self._dirs = dirs
+
+    @classmethod
+    def from_git_tree(cls, commit_sha: str, data: Dict[str, Any]) -> 'RepoTree':
+        """Построить индекс из ответа GET /git/trees/{sha}?recursive=1"""
+        dirs: Dict[str, List[Tuple[str, str, str, int]]] = {'': []}
+        for item in data.get('tree', []):
+            parent, _, name = item['path'].rpartition('/')
+            item_type = _TYPES.get(item['type'], 'file')
+            dirs.setdefault(parent, []).append((name, item_type, item['sha'], item.get('size', 0)))
+            if item_type == 'dir':
+                dirs.setdefault(item['path'], [])
+        return cls(commit_sha, bool(data.get('truncated')), dirs)
+
+    def list_dir(self, path: str = '') -> Optional[List[Dict[str, Any]]]:
+        """Содержимое папки в формате Contents API (None - нужна загрузка из GitHub)"""
+        if self.truncated or path not in self._dirs:
+            return None
+        prefix = f'{path}/' if path else ''
+        return [
+            {'name': name, 'path': prefix + name, 'type': item_type, 'sha': sha, 'size': size}
+            for name, item_type, sha, size in self._dirs[path]
+        ]
+
+    def iter_files(self) -> Iterator[Tuple[str, str, int]]:
+        """Все файлы дерева: (path, sha, size)"""
+        for parent, entries in self._dirs.items():
+            prefix = f'{parent}/' if parent else ''
+            for name, item_type, sha, size in entries:
+                if item_type == 'file':
+                    yield prefix + name, sha, size
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._dirs.values())
@@ -0,0 +1,283 @@
+import asyncio
+import html
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Set
+from telegram import Bot
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes, JobQueue
+from services.supabase_service import SupabaseService
+from services.user_service import UserService
+from services.github_service import GitHubService
+
+# сколько коммитов пуша показывать в уведомлении
+PUSH_COMMITS_SHOWN = 3
+# аренда в БД (migrations/006): репозитории опрашивает только один экземпляр бота
+LEASE_NAME = 'repo_watcher'
+
+
+@dataclass
+class WatchedRepo:
+    """Состояние опроса одного репозитория"""
+    subscribers: Set[int] = field(default_factory=set)
+    # подписчики, чей токен видит репозиторий: user_id -> время последней успешной проверки.
+    # Уведомления и токен для опроса - только из них
+    confirmed: Dict[int, float] = field(default_factory=dict)
+    # id самого нового уже обработанного события (None - ещё не опрашивали)
+    last_event_id: Optional[int] = None
+    # подписчик, чьим токеном опрашиваем: ETag привязан к токену, поэтому его не меняем без нужды
+    poller_id: Optional[int] = None
+    interval: float = 0.0
+    next_poll: float = 0.0
+
+
+def format_event(repo_name: str, event: Dict[str, Any]) -> Optional[str]:
+    """Текст уведомления (HTML) или None, если о событии не сообщаем"""
+    payload = event.get('payload') or {}
+    actor = html.escape((event.get('actor') or {}).get('login', '?'))
+    repo = html.escape(repo_name)
+
+    if event['type'] == 'PushEvent':
+        branch = html.escape(payload.get('ref', '').rsplit('/', 1)[-1])
+        commits = payload.get('commits') or []
+        count = payload.get('size', len(commits))
+        text = f"🔨 <b>{repo}</b>: {actor} → {branch}, коммитов: {count}"
+        for commit in commits[-PUSH_COMMITS_SHOWN:]:
+            message = html.escape(commit.get('message', '').split('\n', 1)[0])
+            text += f"\n• <code>{commit.get('sha', '')[:7]}</code> {message}"
+        return text
+    if event['type'] == 'PullRequestEvent' and payload.get('action') == 'opened':
+        pull = payload.get('pull_request') or {}
+        return (f"🔀 <b>{repo}</b>: новый PR #{pull.get('number', '?')} от {actor}\n"
+                f"{html.escape(pull.get('title', ''))}\n{html.escape(pull.get('html_url', ''))}")
+    if event['type'] == 'IssuesEvent' and payload.get('action') == 'opened':
+        issue = payload.get('issue') or {}
+        return (f"🐞 <b>{repo}</b>: новый issue #{issue.get('number', '?')} от {actor}\n"
+                f"{html.escape(issue.get('title', ''))}\n{html.escape(issue.get('html_url', ''))}")
+    return None
+
+
+class RepoWatcher:
+    """Подписки /watch и общий опрос событий репозиториев.
+
+    Каждый репозиторий опрашивается один раз, сколько бы пользователей на
+    него ни подписалось, и уведомление рассылается подписчикам, чей
+    собственный токен видит репозиторий (доступ перепроверяется раз в access_ttl).
+    Если запущено несколько экземпляров бота, опрашивает только владелец
+    аренды в БД, а подписки, сделанные на других экземплярах, он подхватывает,
+    перечитывая их из БД раз в reload_interval.
+    Запросы условные (ETag): пока в репозитории ничего не происходит,
+    GitHub отвечает 304 и лимит не тратится. Интервал опроса удваивается,
+    пока событий нет (до max_interval), и сбрасывается до min_interval
+    при новой активности.
+    """
+
+    def __init__(self, db: SupabaseService, user_service: UserService, github_service: GitHubService,
+                 min_interval: float, max_interval: float, tick: float, concurrency: int,
+                 max_per_user: int, access_ttl: float, lease_ttl: float, reload_interval: float):
+        self.db = db
+        self.user_service = user_service
+        self.github_service = github_service
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.tick = tick
+        self.max_per_user = max_per_user
+        self.access_ttl = access_ttl
+        self.lease_ttl = lease_ttl
+        self.reload_interval = reload_interval
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._leader = False
+        self._next_reload = 0.0
+        self.repos: Dict[str, WatchedRepo] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._send_semaphore = asyncio.Semaphore(concurrency)
+
+    def _subscribe(self, user_id: int, repo_name: str) -> None:
+        state = self.repos.get(repo_name)
+        if state is None:
+            state = self.repos[repo_name] = WatchedRepo(interval=self.min_interval)
+        state.subscribers.add(user_id)
+
+    def _unsubscribe(self, user_id: int, repo_name: str) -> None:
+        state = self.repos.get(repo_name)
+        if state is None:
+            return
+        state.subscribers.discard(user_id)
+        state.confirmed.pop(user_id, None)
+        if not state.subscribers:
+            del self.repos[repo_name]
+        elif state.poller_id == user_id:
+            state.poller_id = None
+
+    async def reload(self) -> bool:
+        """Перечитать подписки из БД (их могли изменить другие экземпляры). Состояние
+        опроса и подтверждения доступа сохраняются; доступ новых подписчиков проверяется
+        при ближайшем опросе, до этого уведомления им не отправляются"""
+        rows = await self.db.get_repo_watches()
+        if rows is None:
+            return False
+        subscribers: Dict[str, Set[int]] = {}
+        for row in rows:
+            subscribers.setdefault(row['repo_name'], set()).add(row['user_id'])
+        for repo_name in list(self.repos):
+            if repo_name not in subscribers:
+                del self.repos[repo_name]
+        for repo_name, users in subscribers.items():
+            state = self.repos.get(repo_name)
+            if state is None:
+                state = self.repos[repo_name] = WatchedRepo(interval=self.min_interval)
+            state.subscribers = users
+            state.confirmed = {user_id: at for user_id, at in state.confirmed.items() if user_id in users}
+            if state.poller_id not in users:
+                state.poller_id = None
+        return True
+
+    async def watched_by(self, user_id: int) -> Optional[List[str]]:
+        """Репозитории, на которые подписан пользователь (из БД - подписка могла быть
+        сделана на другом экземпляре; None - ошибка БД)"""
+        return await self.db.get_user_watches(user_id)
+
+    async def watch(self, user_id: int, repo_name: str) -> Optional[bool]:
+        """Подписать пользователя (None - его токен не видит репозиторий, False - ошибка БД)"""
+        token = await self.user_service.get_token(user_id)
+        if not token or not await self.github_service.can_read_repo(token, repo_name):
+            return None
+        if not await self.db.add_repo_watch(user_id, repo_name):
+            return False
+        self._subscribe(user_id, repo_name)
+        self.repos[repo_name].confirmed[user_id] = time.monotonic()
+        return True
+
+    async def unwatch(self, user_id: int, repo_name: str) -> bool:
+        """Отписать пользователя (False - ошибка БД)"""
+        if not await self.db.remove_repo_watch(user_id, repo_name):
+            return False
+        self._unsubscribe(user_id, repo_name)
+        return True
+
+    def forget_user(self, user_id: int) -> None:
+        """Убрать все подписки пользователя из памяти (строки в БД удаляются вместе с его данными)"""
+        for repo_name in [repo for repo, state in self.repos.items() if user_id in state.subscribers]:
+            self._unsubscribe(user_id, repo_name)
+
+    def schedule(self, job_queue: Optional[JobQueue]) -> None:
+        """Проверять, какие репозитории пора опросить, каждые tick секунд"""
+        if job_queue is None:
+            print("⚠️ JobQueue недоступен (pip install \"python-telegram-bot[job-queue]\"), "
+                  "уведомления /watch не работают")
+            return
+        job_queue.run_repeating(self._job, interval=self.tick, first=self.tick, name='repo_watcher')
+
+    async def stop(self) -> None:
+        """Отдать аренду, чтобы опрос сразу подхватил другой экземпляр"""
+        if self._leader:
+            self._leader = False
+            await self.db.release_lease(LEASE_NAME, self.holder)
+
+    async def _job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        await self.poll_due(context.bot)
+
+    async def _hold_lease(self) -> bool:
+        """Взять или продлить аренду опроса (False - опрашивает другой экземпляр или БД недоступна)"""
+        held = await self.db.acquire_lease(LEASE_NAME, self.holder, self.lease_ttl)
+        if held and not self._leader:
+            print(f"👀 Опрос репозиториев ведёт этот экземпляр ({self.holder})")
+            # подписки в памяти могли устареть, пока опрашивал другой экземпляр
+            self._next_reload = 0.0
+        elif not held and self._leader:
+            print("👀 Опрос репозиториев передан другому экземпляру")
+        self._leader = held
+        return held
+
+    async def poll_due(self, bot: Bot) -> None:
+        """Опросить репозитории, у которых подошло время (только владельцем аренды)"""
+        if not await self._hold_lease():
+            return
+        if time.monotonic() >= self._next_reload and await self.reload():
+            self._next_reload = time.monotonic() + self.reload_interval
+        now = time.monotonic()
+        due = [(repo, state) for repo, state in self.repos.items() if state.next_poll <= now]
+        await asyncio.gather(*(self._poll(bot, repo, state) for repo, state in due))
+
+    async def _check_access(self, repo_name: str, user_id: int) -> Optional[bool]:
+        token = await self.user_service.get_token(user_id)
+        if not token:
+            return False
+        return await self.github_service.can_read_repo(token, repo_name, background=True)
+
+    async def _refresh_access(self, repo_name: str, state: WatchedRepo) -> None:
+        """Перепроверить доступ подписчиков, у которых истёк срок проверки.
+        Если проверить не удалось (сеть, лимит), прежний результат сохраняется"""
+        now = time.monotonic()
+        due = [user_id for user_id in state.subscribers
+               if now - state.confirmed.get(user_id, float('-inf')) >= self.access_ttl]
+        results = await asyncio.gather(*(self._check_access(repo_name, user_id) for user_id in due))
+        for user_id, allowed in zip(due, results):
+            if user_id not in state.subscribers:
+                continue
+            if allowed:
+                state.confirmed[user_id] = now
+            elif allowed is False:
+                state.confirmed.pop(user_id, None)
+
+    async def _poller_token(self, state: WatchedRepo) -> Optional[str]:
+        """Токен подписчика с подтверждённым доступом: прежний, пока он работает"""
+        candidates = sorted(state.confirmed)
+        if state.poller_id in state.confirmed:
+            candidates.remove(state.poller_id)
+            candidates.insert(0, state.poller_id)
+        for user_id in candidates:
+            token = await self.user_service.get_token(user_id)
+            if token:
+                state.poller_id = user_id
+                return token
+        return None
+
+    async def _poll(self, bot: Bot, repo_name: str, state: WatchedRepo) -> None:
+        async with self._semaphore:
+            await self._refresh_access(repo_name, state)
+            token = await self._poller_token(state)
+            events = await self.github_service.get_repo_events(token, repo_name) if token else None
+        if events is None:
+            # ни у кого нет доступа или лимит исчерпан - опрашиваем реже
+            state.poller_id = None
+            self._reschedule(state, active=False)
+            return
+
+        newest = max((int(event['id']) for event in events), default=0)
+        if state.last_event_id is None:
+            # первый опрос: старые события не рассылаем, только запоминаем место
+            state.last_event_id = newest
+            self._reschedule(state, active=True)
+            return
+
+        fresh = sorted((event for event in events if int(event['id']) > state.last_event_id),
+                       key=lambda event: int(event['id']))
+        state.last_event_id = max(state.last_event_id, newest)
+        self._reschedule(state, active=bool(fresh))
+        for event in fresh:
+            text = format_event(repo_name, event)
+            if text is not None:
+                await self._fan_out(bot, state.confirmed.keys() & state.subscribers, text)
+
+    def _reschedule(self, state: WatchedRepo, active: bool) -> None:
+        if active:
+            state.interval = self.min_interval
+        else:
+            state.interval = min(max(state.interval, self.min_interval) * 2, self.max_interval)
+        state.next_poll = time.monotonic() + state.interval
+
+    async def _send(self, bot: Bot, user_id: int, text: str) -> None:
+        async with self._send_semaphore:
+            try:
+                await bot.send_message(chat_id=user_id, text=text, parse_mode=ParseMode.HTML,
+                                       disable_web_page_preview=True)
+            except Exception as e:
+                print(f"❌ Ошибка отправки уведомления {user_id}: {e}")
+
+    async def _fan_out(self, bot: Bot, subscribers: Set[int], text: str) -> None:
+        """Одно уведомление всем подписчикам с подтверждённым доступом"""
+        await asyncio.gather(*(self._send(bot, user_id, text) for user_id in list(subscribers)))
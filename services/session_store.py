@@ -0,0 +1,119 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Set
+from services.supabase_service import SupabaseService
+
+@dataclass
+class UserSession:
+    """Состояние навигации пользователя"""
+    repo: Optional[str] = None
+    path: str = ''
+    # Список репозиториев для перелистывания: только name, full_name, private (только в памяти)
+    repos: Optional[List[Dict[str, Any]]] = None
+    # Файлы, отмеченные в режиме выбора (None - режим выключен, только в памяти)
+    selected: Optional[Set[str]] = None
+
+
+class SessionStore:
+    """Сессии пользователей в памяти с отложенной записью в таблицу users"""
+
+    # поля сессии -> колонки таблицы users
+    _COLUMNS = {'repo': 'current_repo', 'path': 'current_path'}
+
+    def __init__(self, db: SupabaseService, max_size: int, flush_interval: float):
+        self.db = db
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._sessions: "OrderedDict[int, UserSession]" = OrderedDict()
+        # Изменения, ещё не записанные в БД: user_id -> {колонка: значение}
+        self._dirty: Dict[int, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self, user_id: int) -> UserSession:
+        """Получить сессию (из памяти, при промахе - один запрос к БД)"""
+        session = self._sessions.get(user_id)
+        if session is not None:
+            self._sessions.move_to_end(user_id)
+            return session
+
+        row = await self.db.get_user_session(user_id)
+        session = UserSession(
+            repo=row.get('current_repo'),
+            path=row.get('current_path') or ''
+        )
+        # Незаписанные изменения новее того, что лежит в БД
+        for field, column in self._COLUMNS.items():
+            if column in self._dirty.get(user_id, {}):
+                setattr(session, field, self._dirty[user_id][column])
+        self._put(user_id, session)
+        return session
+
+    def update(self, user_id: int, **fields: Any) -> None:
+        """Изменить сессию в памяти и поставить запись в очередь"""
+        for field, value in fields.items():
+            if field in self._COLUMNS:
+                self._dirty.setdefault(user_id, {})[self._COLUMNS[field]] = value
+
+        session = self._sessions.get(user_id)
+        if session is None:
+            if not self._COLUMNS.keys() <= fields.keys():
+                # Неполную сессию не создаём: при следующем get() она будет
+                # загружена из БД с наложением незаписанных изменений
+                return
+            session = UserSession()
+            self._put(user_id, session)
+        else:
+            self._sessions.move_to_end(user_id)
+
+        for field, value in fields.items():
+            setattr(session, field, value)
+
+    def invalidate(self, user_id: int) -> None:
+        """Забыть сессию пользователя (без записи в БД)"""
+        self._sessions.pop(user_id, None)
+        self._dirty.pop(user_id, None)
+
+    def _put(self, user_id: int, session: UserSession) -> None:
+        self._sessions[user_id] = session
+        while len(self._sessions) > self.max_size:
+            # Вытесненные изменения остаются в _dirty и будут записаны
+            self._sessions.popitem(last=False)
+
+    async def flush(self) -> None:
+        """Записать все накопленные изменения одним upsert в таблицу users"""
+        if not self._dirty:
+            return
+        pending, self._dirty = self._dirty, {}
+        changes = self.db.unit_of_work()
+        for user_id, fields in pending.items():
+            changes.set(user_id, **fields)
+        if not await changes.commit():
+            # Вернуть в очередь, не затирая более свежие изменения
+            for user_id, retry in pending.items():
+                retry.update(self._dirty.get(user_id, {}))
+                self._dirty[user_id] = retry
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Ошибка записи сессий: {e}")
+
+    def start(self) -> None:
+        """Запустить фоновую запись"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Остановить фоновую запись и сбросить остаток в БД"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
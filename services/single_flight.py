@@ -0,0 +1,35 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """Объединение одинаковых одновременных запросов в один"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполнить fn(), либо дождаться уже идущего вызова с тем же ключом.
+        Результат (или исключение) получают все ожидающие"""
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # исключение уже получили ожидающие; если их не осталось - не шумим
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Сколько запросов реально ушло и сколько присоединилось к ним"""
+        return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._inflight)}
@@ -0,0 +1,23 @@
+import time
+from typing import List, Tuple, Optional
+
+class StartupProfiler:
+    """Замер времени этапов запуска (--profile-startup)"""
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self._last = self.started_at
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str, at: Optional[float] = None) -> None:
+        """Закрыть этап: время с предыдущей отметки"""
+        now = time.perf_counter() if at is None else at
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self) -> str:
+        lines = ["⏱  Время запуска:"]
+        for phase, seconds in self.phases:
+            lines.append(f"   {phase:<32} {seconds * 1000:8.1f} ms")
+        lines.append(f"   {'итого':<32} {(self._last - self.started_at) * 1000:8.1f} ms")
+        return "\n".join(lines)
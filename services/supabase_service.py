@@ -1,65 +1,106 @@
-from supabase import create_client, Client
-from typing import Optional, List, Dict, Any
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple, TYPE_CHECKING
 from datetime import datetime
 from config import config
 from services.encryption_service import EncryotionService
+from services.metrics import SUPABASE_LATENCY, SUPABASE_ERRORS
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 class SupabaseService:
     """Ma'lumotlar bazasi bilan ishlash"""
 
     def __init__(self) -> None:
-        self.client = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+        self._client: Optional['Client'] = None
+        self._client_lock = threading.Lock()
         self.encryption_service = EncryotionService()
-        print("Supabasega ulanish")
+        # sinxron .execute() chaqiruvlari event loopni to'xtatmasligi uchun
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.SUPABASE_MAX_WORKERS,
+            thread_name_prefix='supabase'
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
 
-    def save_user_token(self, user_id: int, token: str) -> bool:
-        """foydalanuvchi tokenini saqlash"""
-        try:
-            encrypted_token = self.encryption_service.encrypt(token)
+    @property
+    def client(self) -> 'Client':
+        """bitta klient (ichida httpx keep-alive pool) barcha so'rovlar uchun;
+        birinchi so'rovda yaratiladi - supabase importi ishga tushishni sekinlashtiradi"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from supabase import create_client
+                    self._client = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+                    print("Supabasega ulanish")
+        return self._client
 
-            existing = self.client.table('users').select('user_id').eq('user_id', user_id).execute()
+    async def warm_up(self) -> None:
+        """klientni fon oqimida oldindan yaratish (event loop to'xtamaydi)"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, lambda: self.client)
 
+    async def _execute(self, query):
+        """so'rovni alohida oqimda bajarish (parallel so'rovlar soni cheklangan)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(config.SUPABASE_MAX_CONCURRENCY)
+        table, operation = _query_labels(query)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            try:
+                return await loop.run_in_executor(self._executor, query.execute)
+            except Exception:
+                SUPABASE_ERRORS.inc(table, operation)
+                raise
+            finally:
+                SUPABASE_LATENCY.observe(table, operation, value=time.perf_counter() - started)
 
-            if existing.data:
-                self.client.table('users').update({
-                    'github_token_encrypted': encrypted_token,
-                    'updated_at': datetime.now().isoformat()
-                }).eq('user_id', user_id).execute()
+    def close(self) -> None:
+        """oqimlar pulini yopish"""
+        self._executor.shutdown(wait=True)
 
-            else:
-                self.client.table('users').insert({
-                    'user_id': user_id,
-                    'github_token_encrypted': encrypted_token
-                }).execute
+    def unit_of_work(self) -> 'UserRowsUnitOfWork':
+        """users jadvalidagi o'zgarishlarni yig'ib, bitta upsert bilan yozish"""
+        return UserRowsUnitOfWork(self)
 
+    async def upsert_users(self, rows: List[Dict[str, Any]], ignore_duplicates: bool = False) -> bool:
+        """users qatorlarini bitta so'rovda yozish (on_conflict=user_id).
+        Barcha qatorlarda ustunlar bir xil bo'lishi kerak - yo'q ustun NULL bo'lib qoladi"""
+        try:
+            await self._execute(self.client.table('users').upsert(
+                rows, on_conflict='user_id', ignore_duplicates=ignore_duplicates
+            ))
             return True
         except Exception as e:
-            print(f"token ma'lumotlarni saqlashda xatolik: {e}")
+            print(f"❌ Ошибка записи пользователей: {e}")
             return False
-    
-    def ensure_user_exists(self, user_id: int) -> bool:
-        """Убедиться что пользователь существует в БД (создать если нет)"""
-        try:
-            # Проверяем существует ли
-            existing = self.client.table('users').select('user_id').eq('user_id', user_id).execute()
-        
-            if not existing.data:
-                # Создаём пользователя без токена
-                self.client.table('users').insert({
-                    'user_id': user_id
-                }).execute()
-                print(f"✅ Создан новый пользователь: {user_id}")
-        
-            return True
+
+    async def save_user_token(self, user_id: int, token: str) -> bool:
+        """foydalanuvchi tokenini saqlash (bitta upsert, SELECT siz)"""
+        try:
+            encrypted_token = self.encryption_service.encrypt(token)
         except Exception as e:
-            print(f"❌ Ошибка создания пользователя: {e}")
+            print(f"token ma'lumotlarni saqlashda xatolik: {e}")
             return False
+        changes = self.unit_of_work()
+        changes.set(user_id, github_token_encrypted=encrypted_token)
+        return await changes.commit()
 
-    def get_user_token(self, user_id: int) -> Optional[str]:
+    async def ensure_user_exists(self, user_id: int) -> bool:
+        """Убедиться что пользователь существует в БД (создать если нет) - один запрос,
+        существующая строка не меняется"""
+        return await self.upsert_users([{'user_id': user_id}], ignore_duplicates=True)
+
+    async def get_user_token(self, user_id: int) -> Optional[str]:
         """Получить токен пользователя (с расшифровкой)"""
         try:
-            response = self.client.table('users').select('github_token_encrypted').eq('user_id', user_id).execute()
-            
+            response = await self._execute(
+                self.client.table('users').select('github_token_encrypted').eq('user_id', user_id)
+            )
+
             if response.data and response.data[0]['github_token_encrypted']:
                 encrypted_token = response.data[0]['github_token_encrypted']
                 return self.encryption_service.decrypt(encrypted_token)
@@ -67,95 +108,40 @@ class SupabaseService:
         except Exception as e:
             print(f"❌ Ошибка получения токена: {e}")
             return None
-    
-    def set_current_repo(self, user_id: int, repo_name: str) -> bool:
-        """Установить текущий репозиторий"""
-        try:
-            self.client.table('users').update({
-                'current_repo': repo_name,
-                'updated_at': datetime.now().isoformat()
-            }).eq('user_id', user_id).execute()
-            return True
-        except Exception as e:
-            print(f"❌ Ошибка установки репозитория: {e}")
-            return False
-    
-    def get_current_repo(self, user_id: int) -> Optional[str]:
-        """Получить текущий репозиторий"""
-        try:
-            response = self.client.table('users').select('current_repo').eq('user_id', user_id).execute()
-            
-            if response.data and response.data[0].get('current_repo'):
-                return response.data[0]['current_repo']
-            return None
-        except Exception as e:
-            print(f"❌ Ошибка получения репозитория: {e}")
-            return None
-    
-    def set_current_path(self, user_id: int, path: str) -> bool:
-        """Установить текущий путь"""
-        try:
-            self.client.table('users').update({
-                'current_path': path,
-                'updated_at': datetime.now().isoformat()
-            }).eq('user_id', user_id).execute()
-            return True
+
+    async def get_user_session(self, user_id: int) -> Dict[str, Any]:
+        """Получить текущий репозиторий и путь одним запросом"""
+        try:
+            response = await self._execute(
+                self.client.table('users').select('current_repo, current_path').eq('user_id', user_id)
+            )
+
+            if response.data:
+                return response.data[0]
+            return {}
         except Exception as e:
-            print(f"❌ Ошибка установки пути: {e}")
-            return False
-    
-    def get_current_path(self, user_id: int) -> str:
-        """Получить текущий путь"""
-        try:
-            response = self.client.table('users').select('current_path').eq('user_id', user_id).execute()
-            
-            if response.data and response.data[0].get('current_path'):
-                return response.data[0]['current_path']
-            return ''
-        except Exception as e:
-            print(f"❌ Ошибка получения пути: {e}")
-            return ''
-    
-    def log_action(self, user_id: int, action_type: str, 
-                   repo_name: str = None, file_path: str = None) -> bool:
-        """Логировать действие пользователя"""
-        try:
-            self.ensure_user_exists(user_id)
-            self.client.table('action_history').insert({
-                'user_id': user_id,
-                'action_type': action_type,
-                'repo_name': repo_name,
-                'file_path': file_path
-            }).execute()
+            print(f"❌ Ошибка получения сессии: {e}")
+            return {}
+
+    async def insert_actions(self, rows: List[Dict[str, Any]]) -> bool:
+        """Записать пакет действий одним INSERT"""
+        try:
+            await self._execute(self.client.table('action_history').insert(rows))
             return True
         except Exception as e:
             print(f"❌ Ошибка логирования: {e}")
             return False
-    
-    def get_user_stats(self, user_id: int) -> Dict[str, Any]:
-        """Получить статистику пользователя"""
-        try:
-            # Общее количество действий
-            total_response = self.client.table('action_history').select('id', count='exact').eq('user_id', user_id).execute()
-            total_actions = total_response.count if total_response.count else 0
-            
-            # Действия по типам
-            actions_response = self.client.table('action_history').select('action_type').eq('user_id', user_id).execute()
-            
-            actions_by_type = {}
-            if actions_response.data:
-                for action in actions_response.data:
-                    action_type = action['action_type']
-                    actions_by_type[action_type] = actions_by_type.get(action_type, 0) + 1
-            
-            # Последние 5 действий
-            recent_response = self.client.table('action_history').select('*').eq('user_id', user_id).order('created_at', desc=True).limit(5).execute()
-            recent_actions = recent_response.data if recent_response.data else []
-            
+
+    async def get_user_stats(self, user_id: int) -> Dict[str, Any]:
+        """Получить статистику пользователя (агрегаты считает БД, migrations/001)"""
+        try:
+            response = await self._execute(self.client.rpc('get_user_stats', {'p_user_id': user_id}))
+            stats = response.data or {}
+
             return {
-                'total_actions': total_actions,
-                'actions_by_type': actions_by_type,
-                'recent_actions': recent_actions
+                'total_actions': int(stats.get('total_actions') or 0),
+                'actions_by_type': stats.get('actions_by_type') or {},
+                'recent_actions': stats.get('recent_actions') or []
             }
         except Exception as e:
             print(f"❌ Ошибка получения статистики: {e}")
@@ -164,27 +150,170 @@ class SupabaseService:
                 'actions_by_type': {},
                 'recent_actions': []
             }
-    
-    def delete_user_data(self, user_id: int) -> bool:
+
+    async def delete_user_data(self, user_id: int) -> bool:
         """Удалить все данные пользователя (GDPR compliance)"""
         try:
-            # Удаляем историю действий
-            self.client.table('action_history').delete().eq('user_id', user_id).execute()
+            # Удаляем историю действий и подписки на репозитории
+            await self._execute(self.client.table('action_history').delete().eq('user_id', user_id))
+            await self._execute(self.client.table('repo_watches').delete().eq('user_id', user_id))
+            # Сохранённое состояние бота (migrations/002): ключ диалога - JSON "[chat_id, user_id]"
+            await self._execute(self.client.table('bot_conversations').delete().like('key', f'%, {user_id}]'))
+            await self._execute(self.client.table('bot_user_data').delete().eq('user_id', user_id))
+            await self._execute(self.client.table('bot_chat_data').delete().eq('chat_id', user_id))
             # Удаляем пользователя
-            self.client.table('users').delete().eq('user_id', user_id).execute()
+            await self._execute(self.client.table('users').delete().eq('user_id', user_id))
             return True
         except Exception as e:
             print(f"❌ Ошибка удаления данных: {e}")
             return False
-    
-    def get_all_users_count(self) -> int:
-        """Получить количество всех пользователей"""
-        try:
-            response = self.client.table('users').select('user_id', count='exact').execute()
-            if response.count:
-                return response.count
-            else:
-                return 0
-        except Exception as e:
-            print(f"❌ Ошибка подсчёта пользователей: {e}")
-            return 0
\ No newline at end of file
+
+    async def add_repo_watch(self, user_id: int, repo_name: str) -> bool:
+        """Подписать пользователя на репозиторий (повторная подписка ничего не меняет)"""
+        try:
+            await self._execute(self.client.table('repo_watches').upsert(
+                {'user_id': user_id, 'repo_name': repo_name},
+                on_conflict='user_id,repo_name', ignore_duplicates=True
+            ))
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка сохранения подписки: {e}")
+            return False
+
+    async def remove_repo_watch(self, user_id: int, repo_name: str) -> bool:
+        """Отписать пользователя от репозитория"""
+        try:
+            await self._execute(
+                self.client.table('repo_watches').delete().eq('user_id', user_id).eq('repo_name', repo_name)
+            )
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка удаления подписки: {e}")
+            return False
+
+    async def get_user_watches(self, user_id: int) -> Optional[List[str]]:
+        """Репозитории, на которые подписан пользователь"""
+        try:
+            response = await self._execute(
+                self.client.table('repo_watches').select('repo_name').eq('user_id', user_id).order('repo_name')
+            )
+            return [row['repo_name'] for row in response.data or []]
+        except Exception as e:
+            print(f"❌ Ошибка чтения подписок пользователя: {e}")
+            return None
+
+    async def get_repo_watches(self, page_size: int = 1000) -> Optional[List[Dict[str, Any]]]:
+        """Все подписки (user_id, repo_name) - читаются страницами"""
+        try:
+            rows: List[Dict[str, Any]] = []
+            while True:
+                response = await self._execute(
+                    self.client.table('repo_watches')
+                    .select('user_id, repo_name')
+                    .order('repo_name').order('user_id')
+                    .range(len(rows), len(rows) + page_size - 1)
+                )
+                rows.extend(response.data or [])
+                if len(response.data or []) < page_size:
+                    return rows
+        except Exception as e:
+            print(f"❌ Ошибка чтения подписок: {e}")
+            return None
+
+    async def get_encrypted_tokens_page(self, after_user_id: int, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """user_id > after_user_id bo'lgan keyingi tokenlar sahifasi (keyset, OFFSET siz)"""
+        try:
+            response = await self._execute(
+                self.client.table('users')
+                .select('user_id, github_token_encrypted')
+                .gt('user_id', after_user_id)
+                .not_.is_('github_token_encrypted', 'null')
+                .order('user_id')
+                .limit(limit)
+            )
+            return response.data or []
+        except Exception as e:
+            print(f"❌ Ошибка чтения токенов: {e}")
+            return None
+
+    async def rotate_user_tokens(self, rows: List[Dict[str, Any]]) -> Optional[int]:
+        """Qayta shifrlangan tokenlarni bitta so'rovda yozish (migrations/003).
+        Qator faqat token o'zgarmagan bo'lsa yangilanadi; yangilangan qatorlar soni"""
+        try:
+            response = await self._execute(self.client.rpc('rotate_user_tokens', {'rows': rows}))
+            return int(response.data or 0)
+        except Exception as e:
+            print(f"❌ Ошибка записи токенов: {e}")
+            return None
+
+    async def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Взять или продлить аренду фоновой работы (migrations/006); False - она у другого экземпляра"""
+        try:
+            response = await self._execute(self.client.rpc(
+                'acquire_lease', {'p_name': name, 'p_holder': holder, 'p_ttl_seconds': ttl}
+            ))
+            return bool(response.data)
+        except Exception as e:
+            print(f"❌ Ошибка аренды {name}: {e}")
+            return False
+
+    async def release_lease(self, name: str, holder: str) -> None:
+        """Освободить аренду при остановке"""
+        try:
+            await self._execute(self.client.rpc('release_lease', {'p_name': name, 'p_holder': holder}))
+        except Exception as e:
+            print(f"❌ Ошибка освобождения аренды {name}: {e}")
+
+    async def get_bot_stats(self, exact_limit: int) -> Optional[Dict[str, Any]]:
+        """Общая статистика бота (migrations/004); при users больше exact_limit - оценка"""
+        try:
+            response = await self._execute(self.client.rpc('get_bot_stats', {'p_exact_limit': exact_limit}))
+            return response.data
+        except Exception as e:
+            print(f"❌ Ошибка получения статистики бота: {e}")
+            return None
+
+class UserRowsUnitOfWork:
+    """users qatorlariga o'zgarishlar: bir foydalanuvchi uchun bir nechta set()
+    birlashtiriladi, commit() hammasini bitta upsert bilan yozadi"""
+
+    def __init__(self, db: SupabaseService):
+        self.db = db
+        self._rows: Dict[int, Dict[str, Any]] = {}
+
+    def set(self, user_id: int, **fields: Any) -> None:
+        """ustunlarni o'zgartirish (keyingi set() oldingisining ustiga yoziladi)"""
+        self._rows.setdefault(user_id, {}).update(fields)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    async def commit(self) -> bool:
+        """yig'ilgan o'zgarishlarni yozish. Ustunlar to'plami har xil qatorlar alohida
+        upsert qilinadi, aks holda berilmagan ustunlar NULL bilan almashib ketadi"""
+        if not self._rows:
+            return True
+        updated_at = datetime.now().isoformat()
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for user_id, fields in self._rows.items():
+            row = {'user_id': user_id, **fields, 'updated_at': updated_at}
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        results = await asyncio.gather(*(self.db.upsert_users(rows) for rows in groups.values()))
+        if all(results):
+            self._rows.clear()
+        return all(results)
+
+
+def _query_labels(query) -> Tuple[str, str]:
+    """metrikalar uchun jadval va amal nomi (so'rov quruvchisining ichki maydonlaridan)"""
+    request = getattr(query, 'request', None)
+    path = str(getattr(request, 'path', '') or '')
+    method = str(getattr(request, 'http_method', '') or '').upper()
+    name = path.rstrip('/').rsplit('/', 1)[-1] or 'unknown'
+    if '/rpc/' in path:
+        return name, 'rpc'
+    if method == 'POST':
+        prefer = getattr(request, 'headers', {}).get('prefer') or ''
+        return name, 'upsert' if 'resolution=' in prefer else 'insert'
+    operations = {'GET': 'select', 'HEAD': 'select', 'PATCH': 'update', 'DELETE': 'delete'}
+    return name, operations.get(method, 'unknown')
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+from config import config
+from services.supabase_service import SupabaseService
+from services.encryption_service import EncryotionService
+
+class TokenRotationJob:
+    """Перешифровка всех токенов текущим ключом без остановки бота.
+
+    Таблица users читается страницами по user_id (keyset, без OFFSET и без
+    загрузки всей таблицы), расшифровка старыми ключами и шифрование текущим
+    идут в пуле потоков, запись - одним RPC на страницу, который обновляет
+    строку только если токен не менялся с момента чтения. Скорость
+    ограничена rate строк в секунду. После каждой страницы прогресс пишется
+    в checkpoint-файл, поэтому после остановки работа продолжается с места
+    остановки; смена ключа начинает проход заново.
+    """
+
+    def __init__(self, db: SupabaseService, encryption: EncryotionService, batch_size: int,
+                 workers: int, rate: float, checkpoint_path: str):
+        self.db = db
+        self.encryption = encryption
+        self.batch_size = batch_size
+        self.workers = workers
+        self.rate = rate
+        self.checkpoint_path = checkpoint_path
+        self.stats = {'scanned': 0, 'rotated': 0, 'current': 0, 'failed': 0, 'conflicts': 0}
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"❌ Ошибка чтения checkpoint, начинаю сначала: {e}")
+            return {}
+        # checkpoint от прошлой ротации (другой ключ) не подходит
+        if checkpoint.get('key_id') != self.encryption.key_id():
+            return {}
+        return checkpoint
+
+    def _save_checkpoint(self, last_user_id: int, done: bool) -> None:
+        checkpoint = {
+            'key_id': self.encryption.key_id(),
+            'last_user_id': last_user_id,
+            'done': done,
+            'stats': self.stats
+        }
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _rotate_chunk(self, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int, int]:
+        """Часть страницы в потоке пула: (строки для записи, уже на текущем ключе, не расшифровались)"""
+        from cryptography.fernet import InvalidToken
+        updates = []
+        current = failed = 0
+        for row in rows:
+            token = row['github_token_encrypted']
+            if self.encryption.is_current(token):
+                current += 1
+                continue
+            try:
+                updates.append({
+                    'user_id': row['user_id'],
+                    'old_token': token,
+                    'new_token': self.encryption.rotate(token)
+                })
+            except InvalidToken:
+                # ни один из известных ключей не подходит - строку не трогаем
+                failed += 1
+        return updates, current, failed
+
+    async def _process_page(self, executor: ThreadPoolExecutor, rows: List[Dict[str, Any]]) -> bool:
+        loop = asyncio.get_running_loop()
+        chunk = max(1, -(-len(rows) // self.workers))
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, self._rotate_chunk, rows[i:i + chunk])
+            for i in range(0, len(rows), chunk)
+        ))
+
+        updates = [update for chunk_updates, _, _ in results for update in chunk_updates]
+        if updates:
+            written = await self.db.rotate_user_tokens(updates)
+            if written is None:
+                return False
+            self.stats['rotated'] += written
+            # токен успели заменить новым (уже на текущем ключе)
+            self.stats['conflicts'] += len(updates) - written
+        self.stats['current'] += sum(current for _, current, _ in results)
+        self.stats['failed'] += sum(failed for _, _, failed in results)
+        self.stats['scanned'] += len(rows)
+        return True
+
+    async def run(self) -> bool:
+        """Пройти всю таблицу; False - остановились из-за ошибки БД (продолжится со следующего запуска)"""
+        checkpoint = self._load_checkpoint()
+        if checkpoint.get('done'):
+            print("🔑 Все токены уже зашифрованы текущим ключом")
+            return True
+        last_user_id = checkpoint.get('last_user_id', 0)
+        self.stats.update(checkpoint.get('stats', {}))
+        if last_user_id:
+            print(f"🔑 Перешифровка токенов продолжается с user_id > {last_user_id}")
+
+        started = time.monotonic()
+        scanned = 0
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='token-rotation')
+        try:
+            while True:
+                rows = await self.db.get_encrypted_tokens_page(last_user_id, self.batch_size)
+                if rows is None:
+                    return False
+                if not rows:
+                    break
+                if not await self._process_page(executor, rows):
+                    return False
+                last_user_id = rows[-1]['user_id']
+                scanned += len(rows)
+                self._save_checkpoint(last_user_id, done=False)
+
+                # не больше rate строк в секунду с момента запуска
+                delay = scanned / self.rate - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            self._save_checkpoint(last_user_id, done=True)
+            print(f"✅ Перешифровка токенов завершена: {self.stats}")
+            return True
+        finally:
+            executor.shutdown(wait=False)
+
+
+def create_job(db: SupabaseService) -> TokenRotationJob:
+    """Задание с настройками из config"""
+    return TokenRotationJob(
+        db,
+        EncryotionService(),
+        batch_size=config.TOKEN_ROTATION_BATCH_SIZE,
+        workers=config.TOKEN_ROTATION_WORKERS,
+        rate=config.TOKEN_ROTATION_RATE,
+        checkpoint_path=config.TOKEN_ROTATION_CHECKPOINT
+    )
+
+
+async def _main() -> None:
+    db = SupabaseService()
+    try:
+        await create_job(db).run()
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    # разовый запуск без бота: python -m services.token_rotation
+    asyncio.run(_main())
@@ -1,53 +1,141 @@
-from typing import Optional, Dict, Any
+import asyncio
+from typing import Optional, List, Dict, Any, Set
+from config import config
 from services.supabase_service import SupabaseService
+from services.session_store import SessionStore
+from services.cache import TTLCache
+from services.action_log_writer import ActionLogWriter
 
 class UserService:
     """Управление пользователями через Supabase"""
     
     def __init__(self, supabase_service: SupabaseService):
         self.db = supabase_service
+        self.sessions = SessionStore(
+            supabase_service,
+            max_size=config.SESSION_CACHE_SIZE,
+            flush_interval=config.SESSION_FLUSH_INTERVAL
+        )
+        self.action_log = ActionLogWriter(
+            supabase_service,
+            queue_size=config.ACTION_LOG_QUEUE_SIZE,
+            batch_size=config.ACTION_LOG_BATCH_SIZE,
+            flush_interval=config.ACTION_LOG_FLUSH_INTERVAL,
+            retry_limit=config.ACTION_LOG_RETRY_LIMIT
+        )
+        # Расшифрованные токены: user_id -> token
+        self.tokens = TTLCache(config.TOKEN_CACHE_SIZE, config.TOKEN_CACHE_TTL)
+        self._sweep_task: Optional[asyncio.Task] = None
     
-    def save_token(self, user_id: int, token: str) -> bool:
+    def start(self) -> None:
+        """Запустить фоновую запись сессий и истории действий и очистку токенов"""
+        self.sessions.start()
+        self.action_log.start()
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_tokens())
+    
+    async def close(self) -> None:
+        """Сбросить незаписанные сессии и историю действий в БД"""
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+        self.tokens.clear()
+        await self.sessions.stop()
+        await self.action_log.stop()
+    
+    async def _sweep_tokens(self) -> None:
+        """Расшифрованный токен не живёт в памяти дольше TTL, даже если пользователь не вернулся"""
+        while True:
+            await asyncio.sleep(config.TOKEN_CACHE_SWEEP_INTERVAL)
+            self.tokens.sweep()
+    
+    async def save_token(self, user_id: int, token: str) -> bool:
         """Сохранить токен пользователя"""
-        return self.db.save_user_token(user_id, token)
+        self.tokens.pop(user_id)
+        saved = await self.db.save_user_token(user_id, token)
+        if saved:
+            self.tokens.set(user_id, token)
+        return saved
     
-    def ensure_user_exists(self, user_id: int) -> bool:
+    async def ensure_user_exists(self, user_id: int) -> bool:
         """Убедиться что пользователь существует"""
-        return self.db.ensure_user_exists(user_id)
+        return await self.db.ensure_user_exists(user_id)
     
-    def get_token(self, user_id: int) -> Optional[str]:
-        """Получить токен пользователя"""
-        return self.db.get_user_token(user_id)
+    async def get_token(self, user_id: int) -> Optional[str]:
+        """Получить токен пользователя (сначала из кэша)"""
+        token = self.tokens.get(user_id)
+        if token is None:
+            token = await self.db.get_user_token(user_id)
+            if token:
+                self.tokens.set(user_id, token)
+        return token
     
-    def set_current_repo(self, user_id: int, repo_name: str) -> bool:
-        """Установить текущий репозиторий"""
-        return self.db.set_current_repo(user_id, repo_name)
+    async def set_current_repo(self, user_id: int, repo_name: str) -> bool:
+        """Установить текущий репозиторий (путь сбрасывается в корень)"""
+        self.sessions.update(user_id, repo=repo_name, path='', selected=None)
+        return True
     
-    def get_current_repo(self, user_id: int) -> Optional[str]:
+    async def get_current_repo(self, user_id: int) -> Optional[str]:
         """Получить текущий репозиторий"""
-        return self.db.get_current_repo(user_id)
+        return (await self.sessions.get(user_id)).repo
     
-    def set_current_path(self, user_id: int, path: str) -> bool:
-        """Установить текущий путь"""
-        return self.db.set_current_path(user_id, path)
+    async def set_current_path(self, user_id: int, path: str) -> bool:
+        """Установить текущий путь (выбор файлов сбрасывается)"""
+        self.sessions.update(user_id, path=path, selected=None)
+        return True
     
-    def get_current_path(self, user_id: int) -> str:
+    async def get_current_path(self, user_id: int) -> str:
         """Получить текущий путь"""
-        return self.db.get_current_path(user_id)
+        return (await self.sessions.get(user_id)).path
+    
+    async def set_repos(self, user_id: int, repos: List[Dict[str, Any]]) -> None:
+        """Запомнить список репозиториев для перелистывания страниц. Хранятся только поля
+        для клавиатуры: полные объекты GitHub (~90 полей) в тысячах сессий занимали бы гигабайты"""
+        (await self.sessions.get(user_id)).repos = [
+            {'name': repo['name'], 'full_name': repo['full_name'], 'private': repo['private']}
+            for repo in repos
+        ]
+    
+    async def get_repos(self, user_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Получить запомненный список репозиториев"""
+        return (await self.sessions.get(user_id)).repos
+    
+    async def start_selection(self, user_id: int) -> None:
+        """Включить режим выбора файлов"""
+        (await self.sessions.get(user_id)).selected = set()
+    
+    async def toggle_selected(self, user_id: int, path: str) -> Set[str]:
+        """Отметить файл или снять отметку"""
+        session = await self.sessions.get(user_id)
+        if session.selected is None:
+            session.selected = set()
+        session.selected ^= {path}
+        return session.selected
+    
+    async def get_selected(self, user_id: int) -> Optional[Set[str]]:
+        """Отмеченные файлы (None - режим выбора выключен)"""
+        return (await self.sessions.get(user_id)).selected
+    
+    async def clear_selection(self, user_id: int) -> None:
+        """Выключить режим выбора"""
+        (await self.sessions.get(user_id)).selected = None
     
     def log_action(self, user_id: int, action_type: str, 
                    repo_name: str = None, file_path: str = None) -> bool:
-        """Логировать действие"""
-        return self.db.log_action(user_id, action_type, repo_name, file_path)
+        """Логировать действие (запись в БД происходит в фоне пакетами)"""
+        return self.action_log.log(user_id, action_type, repo_name, file_path)
     
-    def get_stats(self, user_id: int) -> Dict[str, Any]:
+    async def get_stats(self, user_id: int) -> Dict[str, Any]:
         """Получить статистику"""
-        return self.db.get_user_stats(user_id)
+        return await self.db.get_user_stats(user_id)
     
-    def delete_user(self, user_id: int) -> bool:
+    async def delete_user(self, user_id: int) -> bool:
         """Удалить пользователя"""
-        return self.db.delete_user_data(user_id)
-    
-    def get_users_count(self) -> int:
-        """Получить общее количество пользователей"""
-        return self.db.get_all_users_count()
\ No newline at end of file
+        self.sessions.invalidate(user_id)
+        self.tokens.pop(user_id)
+        await self.action_log.forget_user(user_id)
+        return await self.db.delete_user_data(user_id)
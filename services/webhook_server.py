@@ -0,0 +1,99 @@
+import asyncio
+import hmac
+import signal
+from typing import Optional
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+from services.metrics_server import handle_metrics
+
+class WebhookServer:
+    """Приём обновлений Telegram через webhook (вместо run_polling).
+
+    Локальная проверка: оставь WEBHOOK_URL пустым (webhook в Telegram не
+    регистрируется) и отправь записанное обновление:
+        curl -X POST -H 'X-Telegram-Bot-Api-Secret-Token: <секрет>' \\
+             -d @update.json http://127.0.0.1:8443/telegram
+    """
+
+    SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+    def __init__(self, application: Application, listen: str, port: int, path: str,
+                 secret_token: str, public_url: Optional[str], drain_timeout: float,
+                 metrics_path: Optional[str] = None):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.public_url = public_url
+        self.drain_timeout = drain_timeout
+        self.web_app = web.Application()
+        self.web_app.router.add_post(path, self._handle_update)
+        if metrics_path:
+            self.web_app.router.add_get(metrics_path, handle_metrics)
+        self._runner: Optional[web.AppRunner] = None
+        self._draining = False
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        """POST от Telegram: проверить секрет и положить обновление в очередь.
+        Без правильного секрета запрос отклоняется всегда: иначе кто угодно
+        мог бы прислать обновление от имени любого пользователя"""
+        if not self.secret_token or not hmac.compare_digest(
+            request.headers.get(self.SECRET_HEADER, ''), self.secret_token
+        ):
+            return web.Response(status=403)
+        if self._draining:
+            # Telegram повторит доставку позже (уже на другой экземпляр)
+            return web.Response(status=503)
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except Exception:
+            return web.Response(status=400)
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def start(self) -> None:
+        """Запустить HTTP сервер"""
+        self._runner = web.AppRunner(self.web_app, shutdown_timeout=self.drain_timeout)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        print(f"🌐 Webhook: http://{self.listen}:{self.port}{self.path}")
+
+    async def stop(self) -> None:
+        """Перестать принимать обновления и дождаться текущих запросов"""
+        self._draining = True
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def serve(self) -> None:
+        """Полный цикл работы бота в режиме webhook (аналог Application.run_polling)"""
+        app = self.application
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        if self.public_url:
+            await app.bot.set_webhook(
+                url=self.public_url,
+                secret_token=self.secret_token,
+                allowed_updates=Update.ALL_TYPES
+            )
+        await app.start()
+        await self.start()
+
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        try:
+            await stop_event.wait()
+        finally:
+            # сначала закрываем вход, потом Application.stop() дообрабатывает очередь
+            await self.stop()
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+            await app.shutdown()
+            if app.post_shutdown:
+                await app.post_shutdown(app)